@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""
+Benchmark the Spotify collector against a local fake Spotify server.
+
+The fake server answers the token, search, artist-albums and album endpoints
+with deterministic data and a fixed per-request latency, so wall-clock time
+is dominated by how many requests the collector keeps in flight.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import random
+import time
+
+from aiohttp import web
+
+from main import AlbumDiskCache, SpotifyDataCollector
+from similarity import GenreMinHashIndex
+
+
+class FakeSpotifyServer:
+    def __init__(
+        self,
+        latency=0.05,
+        artists_per_genre=20,
+        albums_per_artist=5,
+        token_ttl=3600,
+        allowed_rate=None,
+        failing_listings=0.0,
+    ):
+        self.latency = latency
+        self.artists_per_genre = artists_per_genre
+        self.albums_per_artist = albums_per_artist
+        self.token_ttl = token_ttl
+        self.issued_tokens = {}
+        # Knobs for simulating churn between runs
+        self.search_shift = 0
+        self.new_albums = {}
+        # Requests per second the fake API accepts before answering 429
+        self.allowed_rate = allowed_rate
+        self.window_start = 0
+        self.window_count = 0
+        # Share of album listings whose connection is reset instead of answered
+        self.failing_listings = failing_listings
+        self.request_count = 0
+        self.runner = None
+        self.base = None
+
+    def make_artist(self, artist_id):
+        number = int(artist_id.split("-")[1])
+        return {
+            "id": artist_id,
+            "name": f"Artist {number}",
+            "popularity": max(1, 100 - (number % 500) // 5),
+            "followers": {"total": 1000 * (number + 1)},
+            "genres": [f"genre-{number % 7}", f"genre-{number % 11}"],
+            "external_urls": {"spotify": f"https://open.spotify.com/artist/{artist_id}"},
+            "images": [{"url": f"https://i.scdn.co/image/{artist_id}"}],
+        }
+
+    def make_album(self, album_id):
+        return {
+            "id": album_id,
+            "name": f"Album {album_id}",
+            "release_date": "2024-01-01",
+            "total_tracks": 3,
+            "popularity": sum(map(ord, album_id)) % 100,
+            "album_type": "album",
+            "images": [{"url": f"https://i.scdn.co/image/{album_id}"}],
+            "tracks": {
+                "items": [
+                    {
+                        "name": f"Track {number}",
+                        "duration_ms": 180000,
+                        "track_number": number,
+                        "preview_url": None,
+                    }
+                    for number in range(1, 4)
+                ]
+            },
+        }
+
+    async def respond(self, payload):
+        self.request_count += 1
+        await asyncio.sleep(self.latency)
+        return web.json_response(payload)
+
+    @web.middleware
+    async def check_rate(self, request, handler):
+        if self.allowed_rate is not None and request.path != "/api/token":
+            now = time.monotonic()
+            if now - self.window_start >= 1:
+                self.window_start = now
+                self.window_count = 0
+            self.window_count += 1
+            if self.window_count > self.allowed_rate:
+                self.request_count += 1
+                return web.json_response(
+                    {"error": "rate limited"}, status=429, headers={"Retry-After": "1"}
+                )
+        return await handler(request)
+
+    @web.middleware
+    async def check_token(self, request, handler):
+        if request.path != "/api/token":
+            token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+            issued_at = self.issued_tokens.get(token)
+            if issued_at is None or time.monotonic() - issued_at > self.token_ttl:
+                self.request_count += 1
+                return web.json_response({"error": "expired"}, status=401)
+        return await handler(request)
+
+    async def token(self, request):
+        token = f"fake-token-{len(self.issued_tokens)}"
+        self.issued_tokens[token] = time.monotonic()
+        return await self.respond(
+            {"access_token": token, "token_type": "Bearer", "expires_in": self.token_ttl}
+        )
+
+    async def search(self, request):
+        genre = request.query["q"].split(":", 1)[1]
+        limit = int(request.query.get("limit", 20))
+        offset = int(request.query.get("offset", 0))
+        # Neighbouring genres share half their artists, like real genre tags do
+        first = (sum(map(ord, genre)) % 50) * (self.artists_per_genre // 2)
+        first += self.search_shift
+        items = [
+            self.make_artist(f"artist-{first + position}")
+            for position in range(offset, min(offset + limit, self.artists_per_genre))
+        ]
+        return await self.respond(
+            {"artists": {"items": items, "total": self.artists_per_genre}}
+        )
+
+    async def artist_albums(self, request):
+        artist_id = request.match_info["artist_id"]
+        limit = int(request.query.get("limit", 20))
+        market = request.query.get("market")
+        if sum(map(ord, f"{market}:{artist_id}")) % 100 < self.failing_listings * 100:
+            self.request_count += 1
+            # Drop the connection so the client sees a reset rather than a 500
+            request.transport.close()
+            return web.Response(status=500)
+        new_albums = self.new_albums.get(artist_id, 0)
+        # Outside the US one album isn't licensed, so listings differ by market
+        albums = self.albums_per_artist - (market != "US")
+        # Newest releases first, like Spotify's own ordering
+        items = [
+            {"id": f"{artist_id}-new-{number}", "release_date": "2025-06-01"}
+            for number in range(new_albums)
+        ] + [
+            {"id": f"{artist_id}-album-{number}", "release_date": "2024-01-01"}
+            for number in range(albums)
+        ]
+        return await self.respond({"items": items[:limit], "total": len(items)})
+
+    async def several_artists(self, request):
+        artist_ids = request.query["ids"].split(",")
+        return await self.respond(
+            {"artists": [self.make_artist(artist_id) for artist_id in artist_ids]}
+        )
+
+    async def album(self, request):
+        return await self.respond(self.make_album(request.match_info["album_id"]))
+
+    async def several_albums(self, request):
+        album_ids = request.query["ids"].split(",")
+        return await self.respond(
+            {"albums": [self.make_album(album_id) for album_id in album_ids]}
+        )
+
+    async def start(self):
+        app = web.Application(middlewares=[self.check_rate, self.check_token])
+        app.router.add_post("/api/token", self.token)
+        app.router.add_get("/v1/search", self.search)
+        app.router.add_get("/v1/artists", self.several_artists)
+        app.router.add_get("/v1/artists/{artist_id}/albums", self.artist_albums)
+        app.router.add_get("/v1/albums", self.several_albums)
+        app.router.add_get("/v1/albums/{album_id}", self.album)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base = f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+async def run_collector(
+    server, max_concurrency, previous=None, multi_market=False, **options
+):
+    # Leave the client-side limiter out of the way unless a run asks for it
+    options.setdefault("requests_per_second", 1000)
+    collector = SpotifyDataCollector(
+        "client-id",
+        "client-secret",
+        max_concurrency=max_concurrency,
+        base_url=f"{server.base}/v1",
+        auth_url=f"{server.base}/api/token",
+        **options,
+    )
+    server.request_count = 0
+    start_time = time.perf_counter()
+    # The collector logs every request; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        async with collector:
+            if previous is not None:
+                data = await collector.collect_incremental(previous)
+            elif multi_market:
+                data = await collector.collect_markets()
+            else:
+                data = await collector.collect_all_data()
+    elapsed = time.perf_counter() - start_time
+    return elapsed, server.request_count, collector.get_run_report(), data
+
+
+def discovery_options(args):
+    return {
+        "genres": [f"genre {number}" for number in range(args.genres)],
+        "search_depth": args.search_depth,
+        "popularity_floor": args.popularity_floor,
+        "genre_call_budget": args.genre_call_budget,
+    }
+
+
+async def benchmark_concurrency(args):
+    server = FakeSpotifyServer(
+        latency=args.latency,
+        artists_per_genre=args.artists,
+        albums_per_artist=args.albums,
+        token_ttl=args.token_ttl,
+        allowed_rate=args.allowed_rate,
+    )
+    await server.start()
+    try:
+        print(
+            f"{'concurrency':>12} {'requests':>9} {'seconds':>9} {'req/s':>9} "
+            f"{'refreshes':>10} {'401s':>6} {'429s':>6} {'rate':>7} "
+            f"{'batches':>8} {'saved':>6} {'batch ms':>9} {'memo':>6} {'disk':>6} "
+            f"{'searches':>9}"
+        )
+        for max_concurrency in args.concurrency:
+            # Reloading the cache file each run mimics a fresh Lambda invocation
+            album_cache = AlbumDiskCache(args.album_cache) if args.album_cache else None
+            elapsed, requests_made, report, _ = await run_collector(
+                server,
+                max_concurrency,
+                requests_per_second=args.requests_per_second,
+                album_cache=album_cache,
+                **discovery_options(args),
+            )
+            print(
+                f"{max_concurrency:>12} {requests_made:>9} {elapsed:>9.2f} "
+                f"{requests_made / elapsed:>9.1f} {report['token_refreshes']:>10} "
+                f"{report['unauthorized_retries']:>6} "
+                f"{report['throttled_responses']:>6} {report['final_rate']:>7} "
+                f"{report['album_batches']:>8} {report['album_calls_saved']:>6} "
+                f"{report['album_batch_latency_ms']['mean']:>9} "
+                f"{report['memo_hits']:>6} {report['album_disk_hits']:>6} "
+                f"{sum(g['search_calls'] for g in report['discovery'].values()):>9}"
+            )
+            if args.pipeline:
+                stages = [
+                    (market, name, stage)
+                    for market, market_stages in report["pipeline"].items()
+                    for name, stage in market_stages.items()
+                ]
+                for market, name, stage in stages:
+                    print(
+                        f"{market:>12} {name:<14} workers {stage['workers']:>3} "
+                        f"processed {stage['processed']:>5} "
+                        f"max depth {stage['max_queue_depth']:>4} "
+                        f"mean depth {stage['mean_queue_depth']:>6} "
+                        f"{stage['per_second']:>8}/s"
+                    )
+    finally:
+        await server.stop()
+
+
+async def benchmark_incremental(args):
+    server = FakeSpotifyServer(
+        latency=args.latency,
+        artists_per_genre=args.artists,
+        albums_per_artist=args.albums,
+    )
+    await server.start()
+    try:
+        concurrency = args.concurrency[-1]
+        # With --markets, refresh a multi-market snapshot market by market
+        markets = args.markets or ["US"]
+        elapsed, requests_made, report, snapshot = await run_collector(
+            server,
+            concurrency,
+            multi_market=len(markets) > 1,
+            markets=markets,
+            **discovery_options(args),
+        )
+        print(f"full crawl:        {requests_made:>6} requests {elapsed:>7.2f}s")
+
+        # Churn: a couple of new artists per genre and new albums for a few artists
+        server.search_shift = 2
+        snapshots = snapshot["markets"].values() if "markets" in snapshot else [snapshot]
+        known_ids = list({
+            artist["id"]: None
+            for market_snapshot in snapshots
+            for genre in market_snapshot["spotify_top_genre_artists"]
+            for artist in genre["artists"]
+        })
+        for artist_id in known_ids[:: max(1, int(1 / args.churn))]:
+            server.new_albums[artist_id] = 1
+
+        elapsed, requests_made, report, refreshed = await run_collector(
+            server,
+            concurrency,
+            previous=snapshot,
+            markets=markets,
+            **discovery_options(args),
+        )
+        print(f"incremental:       {requests_made:>6} requests {elapsed:>7.2f}s")
+        print(
+            f"  refreshed {report['artists_refreshed']}, "
+            f"discovered {report['artists_discovered']}, "
+            f"albums reused {report['albums_reused']}, "
+            f"albums re-crawled {report['albums_recrawled']}"
+        )
+        if "markets" in refreshed:
+            print(f"  markets {', '.join(refreshed['markets'])}")
+    finally:
+        await server.stop()
+
+
+async def benchmark_markets(args):
+    server = FakeSpotifyServer(
+        latency=args.latency,
+        artists_per_genre=args.artists,
+        albums_per_artist=args.albums,
+        failing_listings=args.fail_listings,
+    )
+    await server.start()
+    try:
+        concurrency = args.concurrency[-1]
+        elapsed, requests_made, report, _ = await run_collector(
+            server,
+            concurrency,
+            multi_market=True,
+            markets=args.markets,
+            **discovery_options(args),
+        )
+        comparison = report["market_comparison"]
+        print(f"{'market':>8} {'requests':>9} {'standalone':>11}")
+        for market, counts in comparison["markets"].items():
+            print(
+                f"{market:>8} {counts['requests']:>9} "
+                f"{counts['standalone_estimate']:>11}"
+            )
+        print(
+            f"{'total':>8} {comparison['total_requests']:>9} "
+            f"{comparison['standalone_total']:>11}   ({elapsed:.2f}s)"
+        )
+        failed = {
+            market: stages["albums"]["failed"]
+            for market, stages in report["pipeline"].items()
+        }
+        if any(failed.values()):
+            print(f"failed album listings: {failed}")
+
+        separate_requests = 0
+        separate_elapsed = 0
+        for market in args.markets:
+            elapsed, requests_made, _, _ = await run_collector(
+                server, concurrency, markets=[market], **discovery_options(args)
+            )
+            separate_requests += requests_made
+            separate_elapsed += elapsed
+        print(
+            f"separate runs: {separate_requests} requests ({separate_elapsed:.2f}s)"
+        )
+    finally:
+        await server.stop()
+
+
+def benchmark_similarity(args):
+    # Artists draw a few genres from a skewed vocabulary, like real genre tags
+    rng = random.Random(7)
+    vocabulary = [f"genre-{number}" for number in range(args.genre_vocabulary)]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    artists = {
+        f"artist-{number}": set(rng.choices(vocabulary, weights, k=rng.randint(1, 6)))
+        for number in range(args.similarity)
+    }
+
+    start_time = time.perf_counter()
+    index = GenreMinHashIndex()
+    for artist_id, genres in artists.items():
+        index.add(artist_id, genres)
+    neighbours = index.similar_artists(k=args.top_k, min_similarity=args.min_similarity)
+    build_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    found = relevant = 0
+    for artist_id, genres in artists.items():
+        exact = sorted(
+            (
+                (len(genres & other_genres) / len(genres | other_genres), other)
+                for other, other_genres in artists.items()
+                if other != artist_id
+            ),
+            key=lambda item: (-item[0], item[1]),
+        )
+        exact = [
+            score for score, other in exact[: args.top_k] if score >= args.min_similarity
+        ]
+        # Ties at the cut-off make the exact top-k ambiguous, so compare scores
+        approximate = sorted(
+            (entry["similarity"] for entry in neighbours[artist_id]), reverse=True
+        )
+        found += sum(
+            1
+            for exact_score, approximate_score in zip(exact, approximate)
+            if approximate_score >= round(exact_score, 3)
+        )
+        relevant += len(exact)
+    exact_time = time.perf_counter() - start_time
+
+    print(f"artists:             {len(artists)}")
+    print(f"index build + top-{args.top_k}: {build_time:.2f}s")
+    print(f"exact all-pairs:     {exact_time:.2f}s")
+    print(f"recall@{args.top_k}:           {found / relevant if relevant else 1:.3f}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Spotify collector benchmark")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="Simulated seconds per fake Spotify request")
+    parser.add_argument("--genres", type=int, default=4,
+                        help="Number of genres to crawl")
+    parser.add_argument("--artists", type=int, default=20,
+                        help="Search results available per genre")
+    parser.add_argument("--search-depth", type=int, default=50,
+                        help="Artists to page through per genre")
+    parser.add_argument("--popularity-floor", type=int, default=0,
+                        help="Stop paging a genre below this popularity")
+    parser.add_argument("--genre-call-budget", type=int, default=None,
+                        help="Max search calls per genre")
+    parser.add_argument("--albums", type=int, default=5,
+                        help="Albums returned per artist")
+    parser.add_argument("--token-ttl", type=int, default=3600,
+                        help="Seconds before fake tokens expire")
+    parser.add_argument("--allowed-rate", type=int, default=None,
+                        help="Requests per second the fake API allows before 429s")
+    parser.add_argument("--requests-per-second", type=float, default=1000,
+                        help="Starting rate for the collector's rate limiter")
+    parser.add_argument("--album-cache", default=None,
+                        help="Path of an on-disk album cache shared between runs")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Print per-stage queue depth and throughput")
+    parser.add_argument("--markets", nargs="+", default=None,
+                        help="Collect these markets in one run and compare costs")
+    parser.add_argument("--fail-listings", type=float, default=0.0,
+                        help="Share of album listings the fake API drops mid-request")
+    parser.add_argument("--similarity", type=int, default=None,
+                        help="Benchmark the similar-artist index over this many artists")
+    parser.add_argument("--genre-vocabulary", type=int, default=300,
+                        help="Distinct genres in the similarity benchmark")
+    parser.add_argument("--top-k", type=int, default=10,
+                        help="Neighbours per artist in the similarity benchmark")
+    parser.add_argument("--min-similarity", type=float, default=0.5,
+                        help="Jaccard similarity below which neighbours are ignored")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Compare a full crawl with an incremental refresh "
+                        "(of every market given with --markets)")
+    parser.add_argument("--churn", type=float, default=0.05,
+                        help="Share of artists that release an album between runs")
+    parser.add_argument("--concurrency", type=int, nargs="+",
+                        default=[1, 4, 16, 64],
+                        help="Concurrency limits to compare")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.similarity:
+        benchmark_similarity(args)
+    elif args.incremental:
+        asyncio.run(benchmark_incremental(args))
+    elif args.markets:
+        asyncio.run(benchmark_markets(args))
+    else:
+        asyncio.run(benchmark_concurrency(args))
@@ -1,4 +1,4 @@
-import requests
+import aiohttp
 import asyncio
 import boto3
 import json
@@ -6,19 +6,51 @@ import time
 import base64
 from urllib.parse import urlencode
 import os
+import random
+from collections import OrderedDict
 
+from similarity import GenreMinHashIndex
 
-class SpotifyDataCollector:
-    def __init__(self, client_id, client_secret):
+
+class SpotifyTokenManager:
+    """Client-credentials token that refreshes before expiry, one refresh at a time"""
+
+    def __init__(self, client_id, client_secret, auth_url, refresh_margin=60):
         self.client_id = client_id
         self.client_secret = client_secret
+        self.auth_url = auth_url
+        # Refresh this many seconds before Spotify says the token expires
+        self.refresh_margin = refresh_margin
         self.token = None
-        self.base_url = "https://api.spotify.com/v1"
-        self.get_token()
+        self.refresh_at = 0
+        self.refresh_count = 0
+        self.lock = asyncio.Lock()
 
-    async def get_token(self):
+    def is_fresh(self):
+        return (
+            self.token is not None
+            and time.monotonic() < self.refresh_at
+        )
+
+    async def get_token(self, session):
+        """Return a valid token, refreshing it if it is missing or about to expire"""
+        if self.is_fresh():
+            return self.token
+        async with self.lock:
+            # Another coroutine may have refreshed while we waited on the lock
+            if not self.is_fresh():
+                await self.refresh(session)
+            return self.token
+
+    async def invalidate(self, session, stale_token):
+        """Replace a token Spotify rejected, unless someone already replaced it"""
+        async with self.lock:
+            if self.token == stale_token:
+                await self.refresh(session)
+            return self.token
+
+    async def refresh(self, session):
         """Get Spotify API access token"""
-        auth_url = "https://accounts.spotify.com/api/token"
         auth_header = base64.b64encode(
             f"{self.client_id}:{self.client_secret}".encode()
         ).decode()
@@ -28,20 +60,426 @@ class SpotifyDataCollector:
         }
         data = {"grant_type": "client_credentials"}
 
-        response = requests.post(auth_url, headers=headers, data=data)
-        if response.status_code == 200:
-            self.token = response.json()["access_token"]
-            print("Successfully obtained Spotify access token")
-        else:
-            print(f"Error getting token: {response.status_code}")
-            print(response.text)
+        self.refresh_count += 1
+        async with session.post(self.auth_url, headers=headers, data=data) as response:
+            if response.status == 200:
+                token_data = await response.json()
+                self.token = token_data["access_token"]
+                expires_in = token_data.get("expires_in", 3600)
+                # Short-lived tokens still get used for at least half their life
+                margin = min(self.refresh_margin, expires_in / 2)
+                self.refresh_at = time.monotonic() + expires_in - margin
+                print("Successfully obtained Spotify access token")
+            else:
+                self.token = None
+                self.refresh_at = 0
+                print(f"Error getting token: {response.status}")
+                print(await response.text())
+
+
+class AdaptiveRateLimiter:
+    """Token bucket shared by all requests that backs off on 429s and recovers on success"""
+
+    def __init__(self, rate=20.0, min_rate=1.0, increase=0.5, decrease=0.5):
+        self.max_rate = rate
+        self.min_rate = min_rate
+        self.rate = rate
+        # Additive increase per success, multiplicative decrease per 429 (AIMD)
+        self.increase = increase
+        self.decrease = decrease
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Wait until the bucket allows another request"""
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def on_success(self):
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after):
+        """Slow down and hold every caller until Retry-After has passed"""
+        now = time.monotonic()
+        # A burst of 429s from one overshoot should only slow us down once
+        if now >= self.blocked_until:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+        self.tokens = 0
+        self.blocked_until = max(self.blocked_until, now + retry_after)
+
+
+class AlbumBatcher:
+    """Coalesces album lookups from concurrent callers into multi-id requests"""
+
+    def __init__(self, fetch_batch, batch_size=20, flush_window=0.05):
+        # fetch_batch takes a list of ids and returns {id: album or None}
+        self.fetch_batch = fetch_batch
+        self.batch_size = batch_size
+        self.flush_window = flush_window
+        self.pending = {}
+        self.timer = None
+        self.batch_tasks = set()
+        self.lookups = 0
+        self.batch_latencies = []
+
+    async def get(self, album_id):
+        """Queue an album id and wait for the batch that carries it"""
+        self.lookups += 1
+        future = self.pending.get(album_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.pending[album_id] = future
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+            elif self.timer is None:
+                self.timer = asyncio.get_running_loop().call_later(
+                    self.flush_window, self.flush
+                )
+        return await asyncio.shield(future)
+
+    def flush(self):
+        """Send everything pending as one batch"""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, {}
+        task = asyncio.create_task(self.run_batch(batch))
+        self.batch_tasks.add(task)
+        task.add_done_callback(self.batch_tasks.discard)
+
+    async def run_batch(self, batch):
+        start_time = time.monotonic()
+        try:
+            results = await self.fetch_batch(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                future.set_exception(e)
+            return
+        self.batch_latencies.append(time.monotonic() - start_time)
+        for album_id, future in batch.items():
+            future.set_result(results.get(album_id))
+
+    def get_report(self):
+        batches = len(self.batch_latencies)
+        return {
+            "album_lookups": self.lookups,
+            "album_batches": batches,
+            "album_calls_saved": self.lookups - batches,
+            "album_batch_latency_ms": {
+                "mean": round(1000 * sum(self.batch_latencies) / batches, 1)
+                if batches
+                else 0,
+                "max": round(1000 * max(self.batch_latencies), 1) if batches else 0,
+            },
+        }
+
+
+class AlbumDiskCache:
+    """On-disk album cache with a TTL and least-recently-used eviction"""
+
+    def __init__(self, path, ttl=30 * 24 * 3600, max_entries=20000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                # Entries are stored oldest use first, so order survives a reload
+                self.entries = OrderedDict(json.load(f))
+        except (OSError, ValueError):
+            self.entries = OrderedDict()
+
+    def get(self, album_id):
+        entry = self.entries.get(album_id)
+        if entry is None:
+            return None
+        if time.time() - entry["stored_at"] > self.ttl:
+            del self.entries[album_id]
+            return None
+        self.entries.move_to_end(album_id)
+        return entry["album"]
+
+    def put(self, album_id, album):
+        self.entries[album_id] = {"stored_at": time.time(), "album": album}
+        self.entries.move_to_end(album_id)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def save(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        print(f"Album cache saved to {self.path} ({len(self.entries)} albums)")
+
+
+class PipelineStage:
+    """A bounded queue drained by a fixed pool of workers"""
 
-    def get_headers(self):
+    def __init__(self, name, handler, workers, queue_size=100):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.tasks = []
+        self.processed = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.depth_samples = 0
+        self.depth_total = 0
+        self.started_at = None
+        self.finished_at = None
+
+    def start(self):
+        self.started_at = time.monotonic()
+        self.tasks = [asyncio.create_task(self.work()) for _ in range(self.workers)]
+
+    async def put(self, item):
+        """Queue an item, waiting while the stage is full (backpressure)"""
+        await self.queue.put(item)
+        depth = self.queue.qsize()
+        self.max_depth = max(self.max_depth, depth)
+        self.depth_samples += 1
+        self.depth_total += depth
+
+    async def work(self):
+        while True:
+            item = await self.queue.get()
+            try:
+                await self.handler(item)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Error in {self.name} stage: {e}")
+            finally:
+                self.finished_at = time.monotonic()
+                self.queue.task_done()
+
+    async def drain(self):
+        """Wait for everything queued so far, then stop the workers"""
+        await self.queue.join()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def get_report(self):
+        elapsed = (self.finished_at or self.started_at) - self.started_at
+        return {
+            "workers": self.workers,
+            "processed": self.processed,
+            "failed": self.failed,
+            "max_queue_depth": self.max_depth,
+            "mean_queue_depth": round(self.depth_total / self.depth_samples, 1)
+            if self.depth_samples
+            else 0,
+            "per_second": round(self.processed / elapsed, 1) if elapsed else 0,
+        }
+
+
+class SpotifyDataCollector:
+    def __init__(
+        self,
+        client_id,
+        client_secret,
+        max_concurrency=10,
+        requests_per_second=20,
+        max_retries=5,
+        album_batch_size=20,
+        album_flush_window=0.05,
+        album_cache=None,
+        stage_workers=None,
+        queue_size=100,
+        genres=None,
+        search_depth=50,
+        search_page_parallelism=4,
+        popularity_floor=0,
+        genre_call_budget=None,
+        genre_time_budget=None,
+        markets=None,
+        base_url="https://api.spotify.com/v1",
+        auth_url="https://accounts.spotify.com/api/token",
+    ):
+        self.tokens = SpotifyTokenManager(client_id, client_secret, auth_url)
+        self.base_url = base_url
+
+        # Global cap on in-flight Spotify requests, shared by every coroutine
+        self.max_concurrency = max_concurrency
+        self.semaphore = None
+        self.session = None
+        self.rate_limiter = AdaptiveRateLimiter(rate=requests_per_second)
+        self.max_retries = max_retries
+        self.album_batcher = AlbumBatcher(
+            self.fetch_album_batch,
+            batch_size=album_batch_size,
+            flush_window=album_flush_window,
+        )
+
+        # Per-run memo of artist album lists and album details, keyed by id.
+        # Values are tasks, so concurrent requests for the same id share one fetch.
+        self.reset_memos()
+        # Optional AlbumDiskCache that outlives the run
+        self.album_cache = album_cache
+
+        # Workers per crawl stage; album details needs enough to fill album batches
+        self.stage_workers = {
+            "genres": 4,
+            "artists": 4,
+            "albums": 16,
+            "album_details": 2 * album_batch_size,
+            **(stage_workers or {}),
+        }
+        self.queue_size = queue_size
+        self.pipeline_report = {}
+
+        # Genre discovery: which genres, how deep to page, and when to stop early
+        self.genres = genres
+        self.search_depth = search_depth
+        self.search_page_parallelism = search_page_parallelism
+        self.popularity_floor = popularity_floor
+        self.genre_call_budget = genre_call_budget
+        self.genre_time_budget = genre_time_budget
+        self.discovery_report = {}
+
+        # Markets to collect; collect_all_data uses the first
+        self.markets = markets or ["US"]
+        self.market_report = {}
+
+        self.stats = {
+            "requests": 0,
+            "unauthorized_retries": 0,
+            "throttled": 0,
+            "retries": 0,
+            "memo_hits": 0,
+            "album_disk_hits": 0,
+            "artists_refreshed": 0,
+            "artists_discovered": 0,
+            "albums_reused": 0,
+            "albums_recrawled": 0,
+        }
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        """Create the pooled HTTP session and fetch the first token"""
+        if self.session is not None:
+            return
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+        self.session = aiohttp.ClientSession(connector=connector)
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        await self.get_token()
+
+    async def close(self):
+        """Close the HTTP session and release pooled connections"""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def get_json(self, url, params=None):
+        """GET a Spotify endpoint, returning (status, json body, headers)"""
+        refreshed = False
+        for attempt in range(self.max_retries + 1):
+            await self.rate_limiter.acquire()
+            status, body, headers, token = await self.send_get(url, params)
+            if status == 401 and not refreshed:
+                # Token was revoked or expired early; refresh once and retry
+                self.stats["unauthorized_retries"] += 1
+                await self.tokens.invalidate(self.session, token)
+                refreshed = True
+                continue
+            if (status == 429 or status >= 500) and attempt < self.max_retries:
+                retry_after = self.get_retry_after(headers) if status == 429 else 0
+                if status == 429:
+                    self.stats["throttled"] += 1
+                    self.rate_limiter.on_throttle(retry_after)
+                self.stats["retries"] += 1
+                # Full jitter so retrying coroutines don't come back in lockstep
+                backoff = random.uniform(0, min(30, 0.5 * 2**attempt))
+                print(f"Got {status} for {url}, retrying in {backoff + retry_after:.1f}s")
+                await asyncio.sleep(backoff)
+                continue
+            if status == 200:
+                self.rate_limiter.on_success()
+            return status, body, headers
+        return status, body, headers
+
+    def get_retry_after(self, headers, default=5):
+        """Parse the Retry-After header into seconds"""
+        try:
+            return float(headers.get("Retry-After", default))
+        except ValueError:
+            return default
+
+    async def send_get(self, url, params):
+        async with self.semaphore:
+            self.stats["requests"] += 1
+            # Take the token only once we hold a slot, so queued requests don't go stale
+            token = await self.get_token()
+            async with self.session.get(
+                url, params=params, headers=self.get_headers(token)
+            ) as response:
+                if response.status == 200:
+                    body = await response.json()
+                else:
+                    body = await response.text()
+                return response.status, body, response.headers, token
+
+    async def get_token(self):
+        """Get Spotify API access token"""
+        return await self.tokens.get_token(self.session)
+
+    def get_headers(self, token):
         """Return headers with auth token"""
-        return {"Authorization": f"Bearer {self.token}"}
+        return {"Authorization": f"Bearer {token}"}
+
+    def get_run_report(self):
+        """Summarize request activity for this collector's run"""
+        return {
+            "requests": self.stats["requests"],
+            "token_refreshes": self.tokens.refresh_count,
+            "unauthorized_retries": self.stats["unauthorized_retries"],
+            "throttled_responses": self.stats["throttled"],
+            "retries": self.stats["retries"],
+            "final_rate": round(self.rate_limiter.rate, 2),
+            **self.album_batcher.get_report(),
+            "memo_hits": self.stats["memo_hits"],
+            "album_disk_hits": self.stats["album_disk_hits"],
+            "artists_refreshed": self.stats["artists_refreshed"],
+            "artists_discovered": self.stats["artists_discovered"],
+            "albums_reused": self.stats["albums_reused"],
+            "albums_recrawled": self.stats["albums_recrawled"],
+            "pipeline": self.pipeline_report,
+            "discovery": self.discovery_report,
+            "market_comparison": self.market_report,
+        }
 
     def get_top_genres(self, limit=15):
         """Get the most popular genres on Spotify"""
+        if self.genres is not None:
+            return list(self.genres)
+
         # Spotify doesn't have a direct endpoint for popular genres,
         # so we'll use a curated list of popular music genres
         popular_genres = [
@@ -68,112 +506,233 @@ class SpotifyDataCollector:
         ]
         return popular_genres[:limit]
 
-    async def search_artists_by_genre(self, genre, limit=50):
+    async def search_artists_by_genre(self, genre, limit=50, offset=0):
         """Search for top artists in a specific genre"""
         endpoint = f"{self.base_url}/search"
-        query_params = {"q": f"genre:{genre}", "type": "artist", "limit": limit}
+        query_params = {
+            "q": f"genre:{genre}",
+            "type": "artist",
+            "limit": limit,
+            "offset": offset,
+        }
         url = f"{endpoint}?{urlencode(query_params)}"
 
-        response = requests.get(url, headers=self.get_headers())
-        if response.status_code == 200:
-            return response.json()["artists"]["items"]
+        status, body, _ = await self.get_json(url)
+        if status == 200:
+            return body["artists"]["items"]
         else:
-            print(f"Error searching artists for genre {genre}: {response.status_code}")
-            if response.status_code == 401:
-                # Token expired, get a new one
-                self.get_token()
-                return await self.search_artists_by_genre(genre, limit)
-            if response.status_code == 429:
-                # Rate limit exceeded, wait and retry
-                print("Rate limit exceeded, waiting for 60 seconds...")
-                time.sleep(response.headers.get("Retry-After", 5))
-                return await self.search_artists_by_genre(genre, limit)
+            print(f"Error searching artists for genre {genre}: {status}")
             return []
 
-    async def get_artist_albums(self, artist_id, limit=5):
-        """Get top albums for an artist"""
-        print(f"Fetching albums for artist: {artist_id}")
+    async def discover_genre_artists(self, genre, page_size=50):
+        """
+        Page through a genre's search results, several pages at a time, until
+        search_depth artists, a page below popularity_floor, the end of the
+        results, or the genre's call or time budget.
+        """
+        # Spotify won't page a search past offset 1000
+        depth = min(self.search_depth, 1000)
+        start_time = time.monotonic()
+        artists = []
+        calls = 0
+        offset = 0
+        stop_reason = "depth"
+        while offset < depth:
+            if self.genre_call_budget is not None and calls >= self.genre_call_budget:
+                stop_reason = "call budget"
+                break
+            if (
+                self.genre_time_budget is not None
+                and time.monotonic() - start_time >= self.genre_time_budget
+            ):
+                stop_reason = "time budget"
+                break
+
+            wave = []
+            while len(wave) < self.search_page_parallelism and offset < depth:
+                if (
+                    self.genre_call_budget is not None
+                    and calls + len(wave) >= self.genre_call_budget
+                ):
+                    break
+                wave.append(offset)
+                offset += page_size
+            pages = await asyncio.gather(
+                *(
+                    self.search_artists_by_genre(
+                        genre, limit=min(page_size, depth - page_offset), offset=page_offset
+                    )
+                    for page_offset in wave
+                )
+            )
+            calls += len(wave)
+
+            finished = False
+            for page_offset, page in zip(wave, pages):
+                artists.extend(
+                    artist
+                    for artist in page
+                    if artist["popularity"] >= self.popularity_floor
+                )
+                if len(page) < min(page_size, depth - page_offset):
+                    stop_reason = "end of results"
+                    finished = True
+                elif page and all(
+                    artist["popularity"] < self.popularity_floor for artist in page
+                ):
+                    stop_reason = "popularity floor"
+                    finished = True
+            if finished:
+                break
+
+        # Overlapping pages can repeat an artist if results shift mid-crawl
+        unique = {}
+        for artist in artists:
+            unique.setdefault(artist["id"], artist)
+        self.discovery_report[genre] = {
+            "artists": len(unique),
+            "search_calls": calls,
+            "seconds": round(time.monotonic() - start_time, 2),
+            "stopped_by": stop_reason,
+        }
+        return list(unique.values())[:depth]
+
+    async def list_artist_albums(self, artist_id, limit=5, market="US"):
+        """List an artist's albums without details, as {"items": [...], "total": n}"""
+        print(f"Fetching {market} albums for artist: {artist_id}")
         endpoint = f"{self.base_url}/artists/{artist_id}/albums"
-        params = {"include_groups": "album", "limit": limit, "market": "US"}
+        params = {"include_groups": "album", "limit": limit, "market": market}
         url = f"{endpoint}?{urlencode(params)}"
 
-        response = requests.get(url, headers=self.get_headers())
-        if response.status_code == 200:
-            albums = response.json()["items"]
-            # Sort by popularity (need to get details for each album)
-            album_details = []
-            for album in albums[:limit]:
-                details = await self.get_album_details(album["id"])
-                if details:
-                    album_details.append(details)
-
-            # Sort by popularity and take top 5
-            album_details.sort(key=lambda x: x.get("popularity", 0), reverse=True)
-            return album_details[:limit]
+        status, body, _ = await self.get_json(url)
+        if status == 200:
+            items = body["items"][:limit]
+            return {"items": items, "total": body.get("total", len(items))}
         else:
-            print(
-                f"Error getting albums for artist {artist_id}: {response.status_code}"
+            print(f"Error getting albums for artist {artist_id}: {status}")
+            return None
+
+    async def get_album_listing(self, artist_id, limit=5, market="US"):
+        # Album listings are the only market-specific data, so they're memoized per market
+        return await self.memoized(
+            self.album_listing_memo,
+            (market, artist_id),
+            lambda: self.list_artist_albums(artist_id, limit, market),
+        )
+
+    def summarize_listing(self, listing):
+        """Album count and newest release date, used to spot artists with new albums"""
+        if listing is None:
+            return {"album_total": None, "latest_release": None}
+        release_dates = [album.get("release_date", "") for album in listing["items"]]
+        return {
+            "album_total": listing["total"],
+            "latest_release": max(release_dates, default=None),
+        }
+
+    async def get_several_artists(self, artist_ids):
+        """Fetch current artist objects 50 at a time, returning {artist id: artist}"""
+        endpoint = f"{self.base_url}/artists"
+        batches = [artist_ids[i : i + 50] for i in range(0, len(artist_ids), 50)]
+        responses = await asyncio.gather(
+            *(
+                self.get_json(f"{endpoint}?{urlencode({'ids': ','.join(batch)})}")
+                for batch in batches
             )
-            if response.status_code == 401:
-                self.get_token()
-                return await self.get_artist_albums(artist_id, limit)
-            if response.status_code == 429:
-                # Rate limit exceeded, wait and retry
-                print("Rate limit exceeded, waiting for 60 seconds...")
-                time.sleep(response.headers.get("Retry-After", 5))
-                return await self.get_artist_albums(artist_id, limit)
-            return []
+        )
+
+        artists = {}
+        for batch, (status, body, _) in zip(batches, responses):
+            if status != 200:
+                print(f"Error refreshing batch of {len(batch)} artists: {status}")
+                continue
+            for artist in body["artists"]:
+                if artist:
+                    artists[artist["id"]] = artist
+        return artists
+
+    async def memoized(self, memo, key, fetch):
+        """Run fetch() once per key per run, sharing in-flight results"""
+        task = memo.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            memo[key] = task
+        else:
+            self.stats["memo_hits"] += 1
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            # Don't remember failures; a later caller can try again
+            if memo.get(key) is task:
+                del memo[key]
+            raise
 
     async def get_album_details(self, album_id):
-        print(f"Fetching details for album: {album_id}")
         """Get detailed information about an album including tracks"""
-        endpoint = f"{self.base_url}/albums/{album_id}"
-
-        response = requests.get(endpoint, headers=self.get_headers())
-        if response.status_code == 200:
-            album_data = response.json()
-
-            # Create a simplified album structure
-            album = {
-                "name": album_data["name"],
-                "release_date": album_data["release_date"],
-                "total_tracks": album_data["total_tracks"],
-                "popularity": album_data.get("popularity", 0),
-                "album_type": album_data["album_type"],
-                "cover_image": (
-                    album_data["images"][0]["url"] if album_data["images"] else ""
-                ),
-                "songs": [],
-            }
+        return await self.memoized(
+            self.album_memo, album_id, lambda: self.fetch_album_details(album_id)
+        )
 
-            # Add simplified track information
-            for track in album_data["tracks"]["items"]:
-                song = {
-                    "name": track["name"],
-                    "duration_ms": track["duration_ms"],
-                    "track_number": track["track_number"],
-                    "preview_url": track["preview_url"],
-                }
-                album["songs"].append(song)
-
-            return album
-        else:
-            print(f"Error getting album details for {album_id}: {response.status_code}")
-            if response.status_code == 401:
-                self.get_token()
-                return await self.get_album_details(album_id)
-            if response.status_code == 429:
-                # Rate limit exceeded, wait and retry
-                print("Rate limit exceeded, waiting for 60 seconds...")
-                time.sleep(response.headers.get("Retry-After", 5))
-                return await self.get_album_details(album_id)
-            return None
+    async def fetch_album_details(self, album_id):
+        if self.album_cache is not None:
+            album = self.album_cache.get(album_id)
+            if album is not None:
+                self.stats["album_disk_hits"] += 1
+                return album
+
+        print(f"Fetching details for album: {album_id}")
+        album = await self.album_batcher.get(album_id)
+        if album is None:
+            print(f"Error getting album details for {album_id}")
+        elif self.album_cache is not None:
+            self.album_cache.put(album_id, album)
+        return album
+
+    async def fetch_album_batch(self, album_ids):
+        """Fetch up to 20 albums in one request, returning {album id: album}"""
+        endpoint = f"{self.base_url}/albums"
+        url = f"{endpoint}?{urlencode({'ids': ','.join(album_ids)})}"
 
-    async def get_artist_details(self, artist):
-        print(f"Fetching details for artist: {artist['name']}")
+        status, body, _ = await self.get_json(url)
+        if status != 200:
+            print(f"Error getting album batch of {len(album_ids)}: {status}")
+            return {}
+        return {
+            album_data["id"]: self.parse_album(album_data)
+            for album_data in body["albums"]
+            if album_data
+        }
+
+    def parse_album(self, album_data):
+        # Create a simplified album structure
+        album = {
+            "name": album_data["name"],
+            "release_date": album_data["release_date"],
+            "total_tracks": album_data["total_tracks"],
+            "popularity": album_data.get("popularity", 0),
+            "album_type": album_data["album_type"],
+            "cover_image": (
+                album_data["images"][0]["url"] if album_data["images"] else ""
+            ),
+            "songs": [],
+        }
+
+        # Add simplified track information
+        for track in album_data["tracks"]["items"]:
+            song = {
+                "name": track["name"],
+                "duration_ms": track["duration_ms"],
+                "track_number": track["track_number"],
+                "preview_url": track["preview_url"],
+            }
+            album["songs"].append(song)
+
+        return album
 
+    def build_artist_data(self, artist):
         # Create simplified artist structure
-        artist_data = {
+        return {
+            "id": artist["id"],
             "name": artist["name"],
             "popularity": artist["popularity"],
             "followers": artist["followers"]["total"],
@@ -183,32 +742,265 @@ class SpotifyDataCollector:
             "albums": [],
         }
 
-        # Get top albums
-        albums = await self.get_artist_albums(artist["id"])
-        artist_data["albums"] = albums
-        return artist_data
+    async def collect_all_data(self, market=None):
+        """Collect data for top artists across popular genres"""
+        await self.open()
+        self.reset_memos()
+        self.discovery_report = {}
+        self.pipeline_report = {}
+        result = await self.crawl_market(market or self.markets[0])
 
-    async def get_genre_artists(self, genre):
-        """Get artists for a specific genre"""
-        print(f"Fetching artists for genre: {genre}")
-        artists = await self.search_artists_by_genre(genre)
-        genre_data = {"genre_name": genre, "artists": []}
+        if self.album_cache is not None:
+            self.album_cache.save()
+        return result
 
-        tasks = [self.get_artist_details(artist) for artist in artists[:50]]
-        genre_data["artists"] = await asyncio.gather(*tasks)
+    async def collect_markets(self, markets=None):
+        """
+        Collect several market catalogues in one run, keyed by market.
+        Genre searches, artists and album details don't depend on the market and
+        are shared through the run's memos; only album listings are re-fetched.
+        """
+        await self.open()
+        self.reset_memos()
+        self.discovery_report = {}
+        self.pipeline_report = {}
+        markets = markets or self.markets
+        result = {"markets": {}}
+        market_reports = {}
+        for market in markets:
+            requests_before = self.stats["requests"]
+            result["markets"][market] = await self.crawl_market(market)
+            market_reports[market] = {
+                "requests": self.stats["requests"] - requests_before,
+                "standalone_estimate": self.estimate_standalone_requests(
+                    market, result["markets"][market]
+                ),
+            }
+
+        self.market_report = {
+            "markets": market_reports,
+            "total_requests": sum(r["requests"] for r in market_reports.values()),
+            "standalone_total": sum(
+                r["standalone_estimate"] for r in market_reports.values()
+            ),
+        }
+        if self.album_cache is not None:
+            self.album_cache.save()
+        return result
+
+    def estimate_standalone_requests(self, market, market_data):
+        """Requests a cold single-market run would need to produce market_data"""
+        artist_ids = {
+            artist["id"]
+            for genre in market_data["spotify_top_genre_artists"]
+            for artist in genre["artists"]
+        }
+        album_ids = set()
+        for artist_id in artist_ids:
+            # Failed listings are dropped from the memo; they have no albums to count
+            task = self.album_listing_memo.get((market, artist_id))
+            if task is None or not task.done() or task.cancelled() or task.exception():
+                continue
+            listing = task.result()
+            if listing:
+                album_ids.update(album["id"] for album in listing["items"])
+        search_calls = sum(
+            genre["search_calls"] for genre in self.discovery_report.values()
+        )
+        album_batches = -(-len(album_ids) // self.album_batcher.batch_size)
+        # One token, the genre searches, one listing per artist, batched album details
+        return 1 + search_calls + len(artist_ids) + album_batches
 
-        # Sort artists by popularity
-        genre_data["artists"].sort(key=lambda x: x["popularity"], reverse=True)
-        return genre_data
+    async def crawl_market(self, market, previous=None, refreshed=None):
+        """
+        Crawl one market as a pipeline of bounded stages (genre search -> artist ->
+        album listing -> album details), so the number of requests in flight and
+        the amount of queued work stay fixed however large the crawl gets.
 
-    async def collect_all_data(self):
-        """Collect data for top artists across popular genres"""
+        Given a previous snapshot of the market and a task for the refreshed
+        {artist id: artist} objects, known artists keep their albums unless their
+        album listing changed, and only new artists and changed listings reach
+        the album details stage.
+        """
+        genres = self.get_top_genres()
+        genre_results = {genre: {"genre_name": genre, "artists": []} for genre in genres}
+        artist_records = {}
+        artist_album_ids = {}
+        album_results = {}
+
+        previous_genres = {
+            genre["genre_name"]: genre["artists"]
+            for genre in (previous or {}).get("spotify_top_genre_artists", [])
+        }
+        # Artists from snapshots written before ids were recorded are treated as new
+        known = {
+            artist["id"]: artist
+            for genre in genres
+            for artist in previous_genres.get(genre, [])
+            if artist.get("id")
+        }
+        reused = set()
+
+        def reuse_albums(artist_data, known_artist):
+            reused.add(artist_data["id"])
+            artist_data["album_total"] = known_artist.get("album_total")
+            artist_data["latest_release"] = known_artist.get("latest_release")
+            artist_data["albums"] = known_artist["albums"]
+
+        async def search_genre(genre):
+            print(f"Fetching artists for genre: {genre}")
+            artists = await self.memoized(
+                self.discovery_memo, genre, lambda: self.discover_genre_artists(genre)
+            )
+            members = {}
+            if refreshed is not None:
+                current = await refreshed
+                for artist in previous_genres.get(genre, []):
+                    if artist.get("id") in current:
+                        members[artist["id"]] = current[artist["id"]]
+            for artist in artists[: self.search_depth]:
+                members.setdefault(artist["id"], artist)
+            for artist in members.values():
+                await artist_stage.put((genre, artist))
+
+        async def build_artist(item):
+            genre, artist = item
+            # Artists listed under several genres share one record and one crawl
+            if artist["id"] in artist_records:
+                genre_results[genre]["artists"].append(artist_records[artist["id"]])
+                return
+            print(f"Fetching details for artist: {artist['name']}")
+            artist_data = self.build_artist_data(artist)
+            artist_records[artist["id"]] = artist_data
+            genre_results[genre]["artists"].append(artist_data)
+            if previous is not None and artist["id"] not in known:
+                self.stats["artists_discovered"] += 1
+            await album_stage.put(artist_data)
+
+        async def list_albums(artist_data):
+            listing = await self.get_album_listing(artist_data["id"], market=market)
+            summary = self.summarize_listing(listing)
+            known_artist = known.get(artist_data["id"])
+            if known_artist is not None:
+                unchanged = listing is None or (
+                    summary["album_total"] == known_artist.get("album_total")
+                    and summary["latest_release"] == known_artist.get("latest_release")
+                )
+                if unchanged:
+                    self.stats["albums_reused"] += 1
+                    reuse_albums(artist_data, known_artist)
+                    return
+                self.stats["albums_recrawled"] += 1
+            artist_data.update(summary)
+            album_ids = [album["id"] for album in listing["items"]] if listing else []
+            artist_album_ids[artist_data["id"]] = album_ids
+            for album_id in album_ids:
+                if album_id not in album_results:
+                    album_results[album_id] = None
+                    await detail_stage.put(album_id)
+
+        async def fetch_album(album_id):
+            album_results[album_id] = await self.get_album_details(album_id)
+
+        genre_stage = PipelineStage(
+            "genres", search_genre, self.stage_workers["genres"], self.queue_size
+        )
+        artist_stage = PipelineStage(
+            "artists", build_artist, self.stage_workers["artists"], self.queue_size
+        )
+        album_stage = PipelineStage(
+            "albums", list_albums, self.stage_workers["albums"], self.queue_size
+        )
+        detail_stage = PipelineStage(
+            "album_details",
+            fetch_album,
+            self.stage_workers["album_details"],
+            self.queue_size,
+        )
+        stages = [genre_stage, artist_stage, album_stage, detail_stage]
+        for stage in stages:
+            stage.start()
+        for genre in genres:
+            await genre_stage.put(genre)
+        # Each stage only feeds the next, so draining in order finishes the crawl
+        for stage in stages:
+            await stage.drain()
+        self.pipeline_report[market] = {
+            stage.name: stage.get_report() for stage in stages
+        }
+
+        for artist_id, artist_data in artist_records.items():
+            if artist_id not in artist_album_ids and artist_id in known:
+                # A failed listing keeps the albums we already had
+                reuse_albums(artist_data, known[artist_id])
+            if artist_id in reused:
+                continue
+            albums = [
+                album_results[album_id]
+                for album_id in artist_album_ids.get(artist_id, [])
+                if album_results[album_id]
+            ]
+            # Sort by popularity and take top 5
+            albums.sort(key=lambda x: x.get("popularity", 0), reverse=True)
+            artist_data["albums"] = albums[:5]
+
+        result = {"spotify_top_genre_artists": []}
+        for genre in genres:
+            genre_data = genre_results[genre]
+            # Sort artists by popularity
+            genre_data["artists"].sort(key=lambda x: x["popularity"], reverse=True)
+            genre_data["artists"] = genre_data["artists"][: self.search_depth]
+            result["spotify_top_genre_artists"].append(genre_data)
+        return result
+
+    async def collect_incremental(self, previous):
+        """
+        Refresh a previous collect_all_data or collect_markets snapshot instead of
+        crawling from scratch. Known artists get fresh popularity and followers from
+        the several-artists endpoint and keep their albums unless their album
+        listing in that market changed. Only genre search hits missing from a
+        market's snapshot get a full crawl. The result has the same shape as a
+        full run over self.markets; a single-market snapshot is the previous
+        state of the first market.
+        """
+        await self.open()
+        self.reset_memos()
+        self.discovery_report = {}
+        self.pipeline_report = {}
         genres = self.get_top_genres()
-        tasks = [self.get_genre_artists(genre) for genre in genres]
-        result = {"spotify_top_genre_artists": await asyncio.gather(*tasks)}
+        previous_markets = previous.get("markets") or {self.markets[0]: previous}
+        known_ids = {
+            artist["id"]
+            for market in self.markets
+            for genre in previous_markets.get(market, {}).get(
+                "spotify_top_genre_artists", []
+            )
+            if genre["genre_name"] in genres
+            for artist in genre["artists"]
+            if artist.get("id")
+        }
+
+        # Artist objects don't depend on the market, so one refresh serves them all;
+        # the genre searches start while it is in flight
+        refreshed = asyncio.ensure_future(self.get_several_artists(sorted(known_ids)))
+        result = {"markets": {}}
+        for market in self.markets:
+            result["markets"][market] = await self.crawl_market(
+                market, previous_markets.get(market, {}), refreshed
+            )
+        self.stats["artists_refreshed"] = len(await refreshed)
 
+        if self.album_cache is not None:
+            self.album_cache.save()
+        if len(self.markets) == 1:
+            return result["markets"][self.markets[0]]
         return result
 
+    def reset_memos(self):
+        self.discovery_memo = {}
+        self.album_listing_memo = {}
+        self.album_memo = {}
+
     def save_to_json(self, data, filename="spotify_top_genre_artists.json"):
         """Save collected data to a JSON file with nice formatting"""
         with open(filename, "w", encoding="utf-8") as f:
@@ -255,15 +1047,58 @@ async def main():
     # You need to set these environment variables or replace with your actual credentials
     client_id, client_secret = await get_spotify_credentials()
 
-    collector = SpotifyDataCollector(client_id, client_secret)
-    data = await collector.collect_all_data()
+    max_concurrency = int(os.environ.get("SPOTIFY_MAX_CONCURRENCY", 10))
+    requests_per_second = float(os.environ.get("SPOTIFY_REQUESTS_PER_SECOND", 20))
+    genres = os.environ.get("SPOTIFY_GENRES")
+    markets = os.environ.get("SPOTIFY_MARKETS", "US").split(",")
+    call_budget = os.environ.get("SPOTIFY_GENRE_CALL_BUDGET")
+    time_budget = os.environ.get("SPOTIFY_GENRE_TIME_BUDGET")
+    album_cache_path = os.environ.get("SPOTIFY_ALBUM_CACHE_PATH")
+    album_cache = None
+    if album_cache_path:
+        album_cache = AlbumDiskCache(
+            album_cache_path,
+            ttl=float(os.environ.get("SPOTIFY_ALBUM_CACHE_TTL_DAYS", 30)) * 24 * 3600,
+            max_entries=int(os.environ.get("SPOTIFY_ALBUM_CACHE_MAX_ENTRIES", 20000)),
+        )
+    async with SpotifyDataCollector(
+        client_id,
+        client_secret,
+        max_concurrency=max_concurrency,
+        requests_per_second=requests_per_second,
+        album_cache=album_cache,
+        genres=[genre.strip() for genre in genres.split(",")] if genres else None,
+        search_depth=int(os.environ.get("SPOTIFY_SEARCH_DEPTH", 50)),
+        popularity_floor=int(os.environ.get("SPOTIFY_POPULARITY_FLOOR", 0)),
+        genre_call_budget=int(call_budget) if call_budget else None,
+        genre_time_budget=float(time_budget) if time_budget else None,
+        markets=[market.strip() for market in markets],
+    ) as collector:
+        previous_path = os.environ.get("SPOTIFY_PREVIOUS_SNAPSHOT")
+        if previous_path and os.path.exists(previous_path):
+            with open(previous_path, "r", encoding="utf-8") as f:
+                previous = json.load(f)
+            print(f"Refreshing previous snapshot {previous_path}")
+            data = await collector.collect_incremental(previous)
+        elif len(collector.markets) > 1:
+            data = await collector.collect_markets()
+        else:
+            data = await collector.collect_all_data()
+
+    # Publish "similar artists" lookups with the snapshot so readers don't compare genres
+    index_start = time.time()
+    data["similar_artists"] = GenreMinHashIndex.from_snapshot(data).similar_artists()
+    print(f"Built similar-artist index in {time.time() - index_start:.2f} seconds")
     collector.save_to_json(data)
     end_time = time.time()
 
     print(f"Data collection completed in {end_time - start_time:.2f} seconds")
+    print(f"Run report: {json.dumps(collector.get_run_report(), indent=2)}")
 
     # Print sample of the data structure
     print("\nSample of the collected data structure:")
+    if "markets" in data:
+        data = next(iter(data["markets"].values()))
     if data["spotify_top_genre_artists"]:
         genre = data["spotify_top_genre_artists"][0]
         print(f"Genre: {genre['genre_name']}")
@@ -0,0 +1,95 @@
+import random
+import zlib
+
+# Mersenne prime larger than any 32-bit genre hash
+PRIME = (1 << 61) - 1
+
+
+class GenreMinHashIndex:
+    """
+    Approximate "artists similar to X" over genre sets.
+    Each artist's genres become a MinHash signature, and the signature is split
+    into LSH bands; artists that share any band bucket are candidate neighbours.
+    Only candidates are scored, so building avoids the all-pairs comparison.
+    """
+
+    def __init__(self, num_perm=64, bands=32, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = random.Random(seed)
+        self.coefficients = [
+            (rng.randrange(1, PRIME), rng.randrange(0, PRIME)) for _ in range(num_perm)
+        ]
+        self.genres = {}
+        self.names = {}
+        self.signatures = {}
+        self.buckets = [{} for _ in range(bands)]
+
+    def signature(self, genres):
+        hashes = [zlib.crc32(genre.encode("utf-8")) for genre in genres]
+        return tuple(
+            min((a * value + b) % PRIME for value in hashes)
+            for a, b in self.coefficients
+        )
+
+    def band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows : (band + 1) * self.rows]
+
+    def add(self, artist_id, genres, name=None):
+        """Index one artist; artists without genres can't be compared and are skipped"""
+        genres = frozenset(genres)
+        if not genres or artist_id in self.genres:
+            return
+        signature = self.signature(genres)
+        self.genres[artist_id] = genres
+        self.names[artist_id] = name
+        self.signatures[artist_id] = signature
+        for band, key in self.band_keys(signature):
+            self.buckets[band].setdefault(key, []).append(artist_id)
+
+    @classmethod
+    def from_snapshot(cls, data, **options):
+        """Index every artist in a collect_all_data or collect_markets result"""
+        index = cls(**options)
+        snapshots = data["markets"].values() if "markets" in data else [data]
+        for snapshot in snapshots:
+            for genre in snapshot["spotify_top_genre_artists"]:
+                for artist in genre["artists"]:
+                    if artist.get("id"):
+                        index.add(artist["id"], artist["genres"], artist["name"])
+        return index
+
+    def candidates(self, artist_id):
+        found = set()
+        for band, key in self.band_keys(self.signatures[artist_id]):
+            found.update(self.buckets[band][key])
+        found.discard(artist_id)
+        return found
+
+    def query(self, artist_id, k=10, min_similarity=0.0):
+        """Top-k indexed artists by Jaccard similarity of genres, among LSH candidates"""
+        if artist_id not in self.genres:
+            return []
+        genres = self.genres[artist_id]
+        scored = []
+        for other in self.candidates(artist_id):
+            other_genres = self.genres[other]
+            similarity = len(genres & other_genres) / len(genres | other_genres)
+            if similarity >= min_similarity:
+                scored.append((similarity, other))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return scored[:k]
+
+    def similar_artists(self, k=10, min_similarity=0.0):
+        """Precomputed neighbour lists, so readers can look an artist up directly"""
+        return {
+            artist_id: [
+                {"id": other, "name": self.names[other], "similarity": round(score, 3)}
+                for score, other in self.query(artist_id, k, min_similarity)
+            ]
+            for artist_id in self.genres
+        }
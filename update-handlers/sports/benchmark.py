@@ -0,0 +1,771 @@
+#!/usr/bin/env python3
+"""
+Benchmark the ESPN fetcher against a local fake ESPN server.
+
+The fake server serves teams, rosters and schedules for a configurable number
+of leagues and teams, sleeping a fixed latency per request, so wall-clock time
+shows how much of the collection runs in parallel.
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from search import PlayerSearchIndex, normalize_name
+from main import (
+    CollectionCheckpoint, ESPNDataFetcher, GameStore, RosterCache, TeamStandings, expand_sports_data,
+    load_league_registry, normalize_sports_data,
+)
+
+
+class FakeESPNServer:
+    def __init__(self, latency=0.05, teams_per_league=30, players_per_team=25,
+                 live_leagues=(), live_period=0.2, live_ticks=20, league_sizes=None):
+        self.latency = latency
+        self.teams_per_league = teams_per_league
+        # Team counts for leagues that differ from teams_per_league, by ESPN league path
+        self.league_sizes = league_sizes or {}
+        # Send ETags and answer If-None-Match with 304, as ESPN's CDN can
+        self.etags = False
+        # Bumping a team's version changes its roster, e.g. after a trade
+        self.roster_versions = {}
+        self.players_per_team = players_per_team
+        self.days = 10
+        # Games happen on each of the last `days` days, so they fall in the fetch window
+        self.season_start = datetime.now() - timedelta(days=self.days)
+        # Leagues with games in progress today; the score moves every live_period
+        # seconds and the games end after live_ticks periods
+        self.live_leagues = set(live_leagues)
+        self.live_period = live_period
+        self.live_ticks = live_ticks
+        self.live_start = time.monotonic()
+        # Share of scoreboard requests answered 503, as ESPN does under load
+        self.scoreboard_failures = 0
+        self.failure_rng = random.Random(3)
+        self.request_count = 0
+        self.days_requested = 0
+        self.lock = threading.Lock()
+        self.httpd = None
+        self.base = None
+
+    def team(self, league, number):
+        return {
+            "id": str(number + 1),
+            "displayName": f"{league.upper()} Team {number + 1}",
+            "abbreviation": f"T{number + 1}",
+            "nickname": f"Team {number + 1}",
+            "location": f"City {number + 1}",
+            "logos": [{"href": f"https://a.espncdn.com/{league}/{number + 1}.png"}],
+            "colors": [],
+            "links": [],
+        }
+
+    def teams(self, league):
+        return {
+            "sports": [{"leagues": [{"teams": [
+                {"team": self.team(league, number)}
+                for number in range(self.team_count(league))
+            ]}]}]
+        }
+
+    def team_count(self, league):
+        return self.league_sizes.get(league, self.teams_per_league)
+
+    def roster(self, league, team_id):
+        players = [
+            {
+                "id": f"{league}-{team_id}-{number}",
+                "fullName": f"Player {team_id}-{number}" + (
+                    f" v{self.roster_versions[(league, team_id)]}" if (league, team_id) in self.roster_versions else ""
+                ),
+                "jersey": str(number),
+                "position": {"abbreviation": "G"},
+                "height": 72,
+                "weight": 200,
+                "age": 25,
+                "experience": {"years": number % 10},
+            }
+            for number in range(self.players_per_team)
+        ]
+        # Pro rosters are grouped by position; the others are a flat list
+        if league in self.league_sizes:
+            return {"athletes": players}
+        return {"athletes": [{"items": players}]}
+
+    def game(self, league, home, away, day):
+        date = (self.season_start + timedelta(days=day)).strftime("%Y-%m-%dT19:00Z")
+        return {
+            "id": f"{league}-{day}-{min(home, away)}-{max(home, away)}",
+            "date": date,
+            "name": f"Team {away} at Team {home}",
+            "shortName": f"T{away} @ T{home}",
+            "status": {"type": {"completed": True, "state": "post"}},
+            "competitions": [{
+                "venue": {"fullName": f"Arena {home}"},
+                "competitors": [
+                    {"team": {"id": str(home), "displayName": f"{league.upper()} Team {home}"},
+                     "homeAway": "home", "score": str(100 + day % 7), "winner": day % 2 == 0},
+                    {"team": {"id": str(away), "displayName": f"{league.upper()} Team {away}"},
+                     "homeAway": "away", "score": str(95 + day % 5), "winner": day % 2 == 1},
+                ],
+            }],
+        }
+
+    def live_game(self, league, home, away):
+        tick = min(self.live_ticks, int((time.monotonic() - self.live_start) / self.live_period))
+        game = self.game(league, home, away, self.days)
+        game["id"] = f"{league}-live-{home}-{away}"
+        game["status"] = {"type": {
+            "completed": tick >= self.live_ticks,
+            "state": "post" if tick >= self.live_ticks else "in",
+            "shortDetail": "Final" if tick >= self.live_ticks else f"Q{1 + 4 * tick // self.live_ticks}",
+        }}
+        home_team, away_team = game["competitions"][0]["competitors"]
+        home_team["score"] = str(tick * (home % 3 + 1) // 3)
+        away_team["score"] = str(tick * (away % 3 + 1) // 4)
+        return game
+
+    def pairings(self, day, league):
+        """(home, away) team numbers playing on a day, by round-robin rotation"""
+        teams = list(range(1, self.team_count(league) + 1))
+        if len(teams) % 2:
+            teams.append(None)
+        rotation = day % (len(teams) - 1)
+        rotated = [teams[0]] + (teams[1:][-rotation:] + teams[1:][:-rotation] if rotation else teams[1:])
+        half = len(rotated) // 2
+        games = []
+        for first, second in zip(rotated[:half], reversed(rotated[half:])):
+            if first is not None and second is not None:
+                games.append((first, second) if day % 2 else (second, first))
+        return games
+
+    def game_days(self, query):
+        """Days of the fake season inside the request's dates=YYYYMMDD-YYYYMMDD range"""
+        first, last = query["dates"][0].split("-")
+        span = datetime.strptime(last, "%Y%m%d") - datetime.strptime(first, "%Y%m%d")
+        with self.lock:
+            self.days_requested += span.days + 1
+        return [
+            day for day in range(self.days)
+            if first <= (self.season_start + timedelta(days=day)).strftime("%Y%m%d") <= last
+        ]
+
+    def schedule(self, league, team_id, query):
+        team = int(team_id)
+        events = [
+            self.game(league, home, away, day)
+            for day in self.game_days(query)
+            for home, away in self.pairings(day, league)
+            if team in (home, away)
+        ]
+        return {"events": events}
+
+    def scoreboard(self, league, query):
+        events = [
+            self.game(league, home, away, day)
+            for day in self.game_days(query)
+            for home, away in self.pairings(day, league)
+        ]
+        first, last = query["dates"][0].split("-")
+        if league in self.live_leagues and first <= datetime.now().strftime("%Y%m%d") <= last:
+            events += [self.live_game(league, home, away) for home, away in self.pairings(self.days, league)]
+        # ESPN cuts a scoreboard off at its limit without saying so
+        return {"events": events[:int(query.get("limit", ["100"])[0])]}
+
+    def route(self, path, query):
+        parts = path.strip("/").split("/")
+        # /{sport}/{league}/teams[/{id}[/roster|/schedule]]
+        league = parts[1]
+        if parts[2:] == ["teams"]:
+            return self.teams(league)
+        if parts[2:] == ["scoreboard"]:
+            return self.scoreboard(league, query)
+        if len(parts) == 5 and parts[4] == "roster":
+            return self.roster(league, parts[3])
+        if len(parts) == 5 and parts[4] == "schedule":
+            return self.schedule(league, parts[3], query)
+        return None
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server.lock:
+                    server.request_count += 1
+                time.sleep(server.latency)
+                url = urlparse(self.path)
+                if url.path.endswith("/scoreboard") and server.failure_rng.random() < server.scoreboard_failures:
+                    self.send_response(503)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                payload = server.route(url.path, parse_qs(url.query))
+                body = json.dumps(payload).encode()
+                etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+                if server.etags and payload is not None and self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200 if payload is not None else 404)
+                if server.etags:
+                    self.send_header("ETag", etag)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            # The default backlog of 5 drops connections under many workers
+            request_queue_size = 256
+
+        self.httpd = Server(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def stop(self):
+        self.httpd.shutdown()
+
+
+class FakeS3Server:
+    """Just enough of the S3 object API (GET/PUT/DELETE on /bucket/key) for boto3"""
+
+    def __init__(self):
+        self.objects = {}
+        self.puts = 0
+        self.httpd = None
+        self.base = None
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 so boto3's "Expect: 100-continue" uploads are answered
+            protocol_version = "HTTP/1.1"
+
+            def reply(self, status, body=b""):
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path in server.objects:
+                    self.reply(200, server.objects[path])
+                else:
+                    self.reply(404, b"<Error><Code>NoSuchKey</Code><Message>Not found</Message></Error>")
+
+            def do_PUT(self):
+                path = urlparse(self.path).path
+                server.objects[path] = self.rfile.read(int(self.headers["Content-Length"]))
+                server.puts += 1
+                self.reply(200)
+
+            def do_DELETE(self):
+                server.objects.pop(urlparse(self.path).path, None)
+                self.reply(204)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def client(self):
+        import boto3
+        from botocore.config import Config
+
+        return boto3.client(
+            "s3", endpoint_url=self.base, region_name="us-east-1",
+            aws_access_key_id="test", aws_secret_access_key="test",
+            config=Config(s3={"addressing_style": "path"}),
+        )
+
+    def stop(self):
+        self.httpd.shutdown()
+
+
+def run_fetcher(server, **options):
+    fetcher = ESPNDataFetcher(base_url=server.base, **options)
+    server.request_count = 0
+    server.days_requested = 0
+    start_time = time.perf_counter()
+    # The fetcher logs every team; keep the benchmark output readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        fetcher.collect_all_data()
+    return time.perf_counter() - start_time, server.request_count, fetcher
+
+
+def benchmark_workers(args):
+    server = FakeESPNServer(latency=args.latency, teams_per_league=args.teams)
+    server.start()
+    try:
+        baseline = None
+        print(f"{'workers':>8} {'requests':>9} {'seconds':>9} {'speedup':>8} {'same output':>12}")
+        for workers in args.workers:
+            elapsed, requests_made, fetcher = run_fetcher(
+                server, max_workers=workers, requests_per_second=args.rate,
+                bulk_games=args.bulk_games,
+            )
+            if baseline is None:
+                baseline = (elapsed, fetcher.all_data)
+            print(
+                f"{workers:>8} {requests_made:>9} {elapsed:>9.2f} "
+                f"{baseline[0] / elapsed:>7.1f}x {str(fetcher.all_data == baseline[1]):>12}"
+            )
+    finally:
+        server.stop()
+
+
+def benchmark_bulk_games(args):
+    server = FakeESPNServer(latency=args.latency, teams_per_league=args.teams)
+    server.start()
+    try:
+        workers = args.workers[-1]
+        results = {}
+        for bulk_games in (False, True):
+            results[bulk_games] = run_fetcher(
+                server, max_workers=workers, requests_per_second=args.rate,
+                bulk_games=bulk_games,
+            )
+        for bulk_games, label in ((False, "per-team schedules"), (True, "league scoreboards")):
+            elapsed, requests_made, _ = results[bulk_games]
+            print(f"{label:<20} {requests_made:>6} requests {elapsed:>7.2f}s")
+        print(f"same output: {results[False][2].all_data == results[True][2].all_data}")
+    finally:
+        server.stop()
+
+
+def benchmark_game_store(args):
+    server = FakeESPNServer(latency=args.latency, teams_per_league=args.teams)
+    server.start()
+    try:
+        workers = args.workers[-1]
+        standings = {}
+        for bulk_games in (False, True):
+            label = "scoreboards" if bulk_games else "schedules"
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "games.json")
+                outputs = []
+                for run in ("cold", "warm"):
+                    elapsed, requests_made, fetcher = run_fetcher(
+                        server, max_workers=workers, requests_per_second=args.rate,
+                        bulk_games=bulk_games, game_store=GameStore(path),
+                    )
+                    outputs.append(fetcher.all_data)
+                    print(
+                        f"{label:<12} {run}: {requests_made:>5} requests, "
+                        f"{server.days_requested:>6} schedule days, {elapsed:.2f}s"
+                    )
+                print(f"{label:<12} same output: {outputs[0] == outputs[1]}")
+                standings[bulk_games] = {league: outputs[-1][league]["standings"] for league in outputs[-1]}
+        # Both modes store every completed game in the window, so their tables agree
+        print(f"same standings in both modes: {standings[False] == standings[True]}")
+    finally:
+        server.stop()
+
+
+def benchmark_payload(args):
+    if args.payload == "fake":
+        server = FakeESPNServer(latency=0, teams_per_league=args.teams)
+        server.start()
+        try:
+            data = run_fetcher(server, max_workers=args.workers[-1], requests_per_second=args.rate)[2].all_data
+        finally:
+            server.stop()
+    else:
+        with open(args.payload, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        # Published snapshots wrap the leagues in {"data": ..., "updated": ...}
+        data = data.get("data", data)
+
+    normalized = normalize_sports_data(data)
+    for label, payload in (("nested", data), ("normalized", normalized)):
+        start_time = time.perf_counter()
+        for _ in range(args.repeat):
+            body = json.dumps(payload)
+        elapsed = (time.perf_counter() - start_time) / args.repeat
+        print(f"{label:<11} {len(body):>10,} bytes  {1000 * elapsed:>7.1f} ms to serialize")
+
+    start_time = time.perf_counter()
+    expanded = expand_sports_data(normalized)
+    print(f"expand:     {1000 * (time.perf_counter() - start_time):>7.1f} ms, round trip equal: {expanded == data}")
+
+
+def benchmark_live(args):
+    server = FakeESPNServer(latency=args.latency, teams_per_league=args.teams, live_leagues=["nba"])
+    server.start()
+    try:
+        _, rebuild_requests, fetcher = run_fetcher(
+            server, max_workers=args.workers[-1], requests_per_second=args.rate, bulk_games=True,
+        )
+        rebuild_bytes = len(json.dumps(fetcher.all_data))
+
+        published = []
+        server.request_count = 0
+        server.scoreboard_failures = args.live_failures
+        server.live_start = time.monotonic()
+        start_time = time.perf_counter()
+        fetcher = ESPNDataFetcher(base_url=server.base, max_workers=args.workers[-1], requests_per_second=args.rate)
+        fetcher.poll_live(
+            lambda kind, document: published.append((kind, len(json.dumps(document)), document)),
+            interval=server.live_period / 2, idle_interval=server.live_period * 5,
+            compact_every=10, max_polls=args.live,
+        )
+        elapsed = time.perf_counter() - start_time
+
+        deltas = [size for kind, size, _ in published if kind == "delta"]
+        fulls = [size for kind, size, _ in published if kind == "full"]
+        # Every game is new on the first poll, which is published as a full state
+        republished = sum(
+            1 for kind, _, document in published if kind == "delta"
+            for change in document["changes"] if change["change"] == "new"
+        )
+        print(f"live polls:     {args.live} in {elapsed:.2f}s, {server.request_count} requests "
+              f"({server.request_count / args.live:.2f} per poll)")
+        print(f"deltas:         {len(deltas)} published, {sum(deltas) / max(1, len(deltas)):,.0f} bytes average")
+        print(f"compactions:    {len(fulls)} published, {sum(fulls) / max(1, len(fulls)):,.0f} bytes average")
+        print(f"full rebuild:   {rebuild_requests} requests, {rebuild_bytes:,} bytes per refresh")
+        print(f"failed polls:   {fetcher.stats['live_poll_errors']}, games republished as new: {republished}")
+    finally:
+        server.stop()
+
+
+def benchmark_checkpoint(args):
+    server = FakeESPNServer(latency=args.latency, teams_per_league=args.teams)
+    server.start()
+    s3 = FakeS3Server()
+    s3.start()
+    try:
+        workers = args.workers[-1]
+        full_time, full_requests, fetcher = run_fetcher(
+            server, max_workers=workers, requests_per_second=args.rate, bulk_games=True,
+        )
+        expected = fetcher.all_data
+        print(f"uninterrupted:  {full_requests:>5} requests {full_time:>6.2f}s")
+
+        location = "s3://checkpoints/espn_checkpoint.json"
+        # Cut the first run off partway, as a Lambda timeout would
+        deadline = time.perf_counter() + full_time * args.checkpoint
+        with contextlib.redirect_stdout(io.StringIO()):
+            checkpoint = CollectionCheckpoint(location, s3_client=s3.client())
+        fetcher = ESPNDataFetcher(
+            base_url=server.base, max_workers=workers, requests_per_second=args.rate, bulk_games=True,
+            checkpoint=checkpoint,
+        )
+        fetch_roster = fetcher.fetch_roster
+
+        def fetch_roster_until_deadline(league, team_id):
+            if time.perf_counter() > deadline:
+                raise TimeoutError("simulated Lambda timeout")
+            return fetch_roster(league, team_id)
+
+        fetcher.fetch_roster = fetch_roster_until_deadline
+        server.request_count = 0
+        start_time = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                fetcher.collect_all_data()
+        except TimeoutError:
+            pass
+        cut_time, cut_requests = time.perf_counter() - start_time, server.request_count
+        print(f"timed out:      {cut_requests:>5} requests {cut_time:>6.2f}s, "
+              f"{len(fetcher.checkpoint.teams)} teams checkpointed in {s3.puts} uploads")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            checkpoint = CollectionCheckpoint(location, s3_client=s3.client())
+        resumed_time, resumed_requests, fetcher = run_fetcher(
+            server, max_workers=workers, requests_per_second=args.rate, bulk_games=True,
+            checkpoint=checkpoint,
+        )
+        print(f"resumed:        {resumed_requests:>5} requests {resumed_time:>6.2f}s")
+        print(f"same output: {fetcher.all_data == expected}, "
+              f"checkpoint cleared: {not s3.objects}")
+    finally:
+        s3.stop()
+        server.stop()
+
+
+def benchmark_registry(args):
+    registry = load_league_registry(args.registry)
+    sizes = {
+        "college-football": 134, "mens-college-basketball": 362, "womens-college-basketball": 360,
+    }
+    league_sizes = {
+        entry.get("league", key): sizes.get(entry.get("league", key), 20)
+        for key, entry in registry.items() if entry.get("league", key) != key
+    }
+    server = FakeESPNServer(latency=args.latency, teams_per_league=args.teams, league_sizes=league_sizes)
+    server.start()
+    try:
+        # The same leagues with every per-league budget removed
+        uniform = {
+            key: {name: value for name, value in entry.items() if name not in ("max_workers", "share")}
+            for key, entry in registry.items()
+        }
+        workers = args.workers[0]
+        reports = {}
+        print(f"host cap: {args.host_rate:g} requests/s")
+        runs = [("uniform budgets", uniform), ("registry budgets", registry)]
+        if uniform == registry:
+            # No per-league budgets to compare against
+            runs = runs[:1]
+        for label, leagues in runs:
+            elapsed, requests_made, fetcher = run_fetcher(
+                server, max_workers=workers, requests_per_second=args.host_rate, bulk_games=True, leagues=leagues,
+            )
+            teams = sum(len(league["teams"]) for league in fetcher.all_data.values())
+            print(f"{label}: {teams} teams, {requests_made} requests, {elapsed:.2f}s "
+                  f"({teams / elapsed:.1f} teams/s, {requests_made / elapsed:.1f} requests/s; "
+                  f"the cap allows no less than {requests_made / args.host_rate:.1f}s)")
+            reports[label] = fetcher.league_report
+        print(f"{'league':<12} {'teams':>6} {'uniform s':>10} {'registry s':>11} {'teams/s':>8}")
+        for league, report in reports[label].items():
+            print(f"{league:<12} {report['teams']:>6} {reports['uniform budgets'][league]['seconds']:>10.2f} "
+                  f"{report['seconds']:>11.2f} {report['teams_per_second']:>8.1f}")
+
+        # Every game in the window should arrive, even where one request would overflow
+        print(f"{'league':<12} {'games':>6} {'expected':>9}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            games = {league: fetcher.fetch_league_games(league) for league in registry}
+        for league, entry in registry.items():
+            fetched = {game['id'] for team_games in games[league].values() for game in team_games}
+            path = entry.get("league", league)
+            expected = sum(len(server.pairings(day, path)) for day in range(server.days))
+            print(f"{league:<12} {len(fetched):>6} {expected:>9}")
+        print(f"scoreboard splits: {fetcher.stats['scoreboard_splits']}")
+    finally:
+        server.stop()
+
+
+def benchmark_roster_cache(args):
+    server = FakeESPNServer(latency=args.latency, teams_per_league=args.teams, players_per_team=60)
+    server.start()
+    try:
+        workers = args.workers[-1]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "rosters.json")
+            print(f"{'run':<24} {'rebuilt':>8} {'reused':>7} {'304s':>6} {'seconds':>8} {'same output':>12}")
+            runs = (
+                ("cold", False, 0),
+                ("warm, fingerprints", False, 0),
+                ("warm, ETags", True, 0),
+                ("warm, ETags, 10% moved", True, 0.1),
+            )
+            for label, etags, changed in runs:
+                server.etags = etags
+                for league in ("nfl", "nba", "mlb", "nhl"):
+                    for number in range(int(args.teams * changed)):
+                        key = (league, str(number + 1))
+                        server.roster_versions[key] = server.roster_versions.get(key, 0) + 1
+                _, _, expected = run_fetcher(server, max_workers=workers, requests_per_second=args.rate)
+                elapsed, _, fetcher = run_fetcher(
+                    server, max_workers=workers, requests_per_second=args.rate, roster_cache=RosterCache(path),
+                )
+                report = fetcher.get_run_report()
+                print(
+                    f"{label:<24} {report['rosters_rebuilt']:>8} {report['rosters_reused']:>7} "
+                    f"{report['rosters_not_modified']:>6} {elapsed:>8.2f} {str(fetcher.all_data == expected.all_data):>12}"
+                )
+    finally:
+        server.stop()
+
+
+def benchmark_standings(args):
+    server = FakeESPNServer(latency=args.latency, teams_per_league=args.teams)
+    server.start()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "games.json")
+            for run in ("cold", "warm", "next day"):
+                if run == "next day":
+                    # A new day of games lands after the last run
+                    server.days += 1
+                _, _, fetcher = run_fetcher(
+                    server, max_workers=args.workers[-1], requests_per_second=args.rate,
+                    bulk_games=True, game_store=GameStore(path),
+                )
+                store = fetcher.game_store
+                start_time = time.perf_counter()
+                rebuilt = TeamStandings()
+                for game in store.games.values():
+                    rebuilt.apply(game)
+                rebuild_ms = 1000 * (time.perf_counter() - start_time)
+                same = all(rebuilt.table(league) == fetcher.all_data[league]["standings"] for league in fetcher.leagues)
+                print(
+                    f"{run:<9} {fetcher.get_run_report()['standings_games_applied']:>5} games applied, "
+                    f"{len(store.games)} in store (full rebuild {rebuild_ms:.1f} ms), matches rebuild: {same}"
+                )
+            print(json.dumps(fetcher.all_data["nba"]["standings"][0]))
+    finally:
+        server.stop()
+
+
+FIRST_NAMES = [
+    "James", "Luka", "Nikola", "Giannis", "Jayson", "Shai", "Anthony", "Stephen", "Kevin", "Joel",
+    "Patrick", "Josh", "Justin", "Lamar", "Travis", "Connor", "Auston", "Nathan", "Cale", "Mookie",
+    "Shohei", "Aaron", "Juan", "Mike", "Ronald", "Fernando", "De'Aaron", "Tyrese", "Zion", "Ja",
+]
+# Surnames are built from syllables: real rosters repeat first names far more than last names
+SYLLABLES = [
+    "al", "ben", "car", "dar", "el", "fen", "gal", "har", "is", "jen", "kal", "lor", "mac", "nor", "o",
+    "per", "quin", "ros", "sten", "tor", "u", "van", "wal", "yor", "zan", "ton", "son", "ski", "ez", "ov",
+]
+POSITIONS = ["G", "F", "C", "QB", "WR", "RB", "P", "SS", "D", "LW"]
+
+
+def synthetic_rosters(leagues, teams, players, seed=1):
+    rng = random.Random(seed)
+    return {
+        f"league{number}": {"teams": [
+            {"id": str(team + 1), "name": f"Team {team + 1}", "roster": [
+                {
+                    "id": f"{number}-{team}-{player}",
+                    "fullName": f"{rng.choice(FIRST_NAMES)} "
+                                f"{''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title()}"
+                                f"{rng.choice(['', '', '', ' Jr.'])}",
+                    "position": rng.choice(POSITIONS),
+                }
+                for player in range(players)
+            ]}
+            for team in range(teams)
+        ]}
+        for number in range(leagues)
+    }
+
+
+def linear_search(index, query, k=10, league=None, position=None):
+    """What a reader does without the index: check every player"""
+    words = normalize_name(query).split()
+    found = []
+    for player in index.players:
+        if (league is None or player[2] == league) and (position is None or player[5] == position):
+            tokens = normalize_name(player[1]).split()
+            if all(any(token.startswith(word) for token in tokens) for word in words):
+                found.append(player[0])
+    return found[:k]
+
+
+def benchmark_search(args):
+    rng = random.Random(2)
+    print(f"{'leagues':>7} {'players':>8} {'build ms':>9} {'index KB':>9} "
+          f"{'prefix p50/p99 us':>18} {'fuzzy p50/p99 us':>17} {'scan p50 us':>12} {'same':>5}")
+    for leagues in args.search:
+        data = synthetic_rosters(leagues, args.teams, 25)
+        start_time = time.perf_counter()
+        index = PlayerSearchIndex.from_sports_data(data)
+        build_ms = 1000 * (time.perf_counter() - start_time)
+        size_kb = len(json.dumps(index.to_dict())) / 1024
+
+        queries = []
+        for _ in range(500):
+            player = rng.choice(index.players)
+            name = normalize_name(player[1])
+            cut = rng.randint(1, len(name))
+            # Someone typing part of a real player's name, sometimes narrowed to their league or position
+            options = rng.choice([{}, {"league": player[2]}, {"position": player[5]}])
+            queries.append((name[:cut], options))
+        # A dropped letter early in the name, usually in a common first name ("jmes")
+        typos = [(name[:2] + name[3:], {}) for name, _ in queries if len(name) > 4][:100]
+
+        def timings(query_list, search):
+            times = []
+            for query, options in query_list:
+                start_time = time.perf_counter()
+                search(query, **options)
+                times.append(1e6 * (time.perf_counter() - start_time))
+            times.sort()
+            return statistics.median(times), times[int(len(times) * 0.99)]
+
+        p50, p99 = timings(queries, index.search)
+        fuzzy_p50, fuzzy_p99 = timings(typos, index.search)
+        scan_p50, _ = timings(queries[:100], lambda query, **options: linear_search(index, query, **options))
+        same = all(
+            [player["id"] for player in index.search(query, fuzzy=False, **options)]
+            == linear_search(index, query, **options)
+            for query, options in queries[:100]
+        )
+        print(f"{leagues:>7} {len(index.players):>8} {build_ms:>9.1f} {size_kb:>9.0f} "
+              f"{p50:>8.1f} / {p99:>7.1f} {fuzzy_p50:>7.1f} / {fuzzy_p99:>7.1f} {scan_p50:>12.1f} {str(same):>5}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="ESPN fetcher benchmark")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="Simulated seconds per fake ESPN request")
+    parser.add_argument("--teams", type=int, default=30,
+                        help="Teams per league")
+    parser.add_argument("--rate", type=float, default=1000,
+                        help="Per-host requests per second allowed by the fetcher")
+    parser.add_argument("--host-rate", type=float, default=10,
+                        help="Requests per second to ESPN in the registry benchmark (production default: 10)")
+    parser.add_argument("--bulk-games", action="store_true",
+                        help="Use league scoreboards for recent games")
+    parser.add_argument("--compare-bulk", action="store_true",
+                        help="Compare per-team schedules with league scoreboards")
+    parser.add_argument("--game-store", action="store_true",
+                        help="Compare a cold run with a warm game store run")
+    parser.add_argument("--payload", default=None,
+                        help="Compare nested and normalized sizes for a saved snapshot, "
+                             "or 'fake' to collect one from the fake server")
+    parser.add_argument("--repeat", type=int, default=10,
+                        help="Serializations to average in the payload benchmark")
+    parser.add_argument("--live", type=int, default=None, metavar="POLLS",
+                        help="Poll live scoreboards this many times and report delta sizes")
+    parser.add_argument("--live-failures", type=float, default=0,
+                        help="Share of live scoreboard polls the fake server fails")
+    parser.add_argument("--checkpoint", type=float, default=None, metavar="FRACTION",
+                        help="Time out a checkpointed run after this fraction of a full run, then resume it")
+    parser.add_argument("--registry", default=None, metavar="CONFIG",
+                        help="Crawl every league in a registry config (e.g. leagues.json), "
+                             "with and without its per-league budgets")
+    parser.add_argument("--roster-cache", action="store_true",
+                        help="Compare cold and warm runs with the roster cache")
+    parser.add_argument("--standings", action="store_true",
+                        help="Check incremental standings against a full rebuild over several runs")
+    parser.add_argument("--search", type=int, nargs="+", default=None, metavar="LEAGUES",
+                        help="Player search latency over synthetic rosters for these league counts")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16],
+                        help="Worker thread counts to compare")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.search:
+        benchmark_search(args)
+    elif args.standings:
+        benchmark_standings(args)
+    elif args.roster_cache:
+        benchmark_roster_cache(args)
+    elif args.registry:
+        benchmark_registry(args)
+    elif args.checkpoint:
+        benchmark_checkpoint(args)
+    elif args.live:
+        benchmark_live(args)
+    elif args.payload:
+        benchmark_payload(args)
+    elif args.game_store:
+        benchmark_game_store(args)
+    elif args.compare_bulk:
+        benchmark_bulk_games(args)
+    else:
+        benchmark_workers(args)
@@ -1,24 +1,593 @@
 import requests
 import json
+import bisect
+import contextlib
+import hashlib
 import time
-from datetime import datetime, timedelta
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
 import os
 
-class ESPNDataFetcher:
+from search import PlayerSearchIndex
+
+
+class HostRateLimiter:
+    """
+    Thread-safe token bucket per host, shared by every worker thread. Callers
+    name the league they fetch for, and while several leagues are waiting on
+    the same host the next token goes to the one furthest behind its share
+    (tokens granted / weight). Each league gets its share of the host's rate
+    under contention, and a league with nothing to fetch leaves it to the rest.
+    """
+
+    def __init__(self, requests_per_second=10, burst=None, shares=None):
+        self.rate = requests_per_second
+        self.capacity = burst or max(1, requests_per_second)
+        # league -> relative weight; unlisted leagues weigh 1
+        self.shares = shares or {}
+        self.buckets = {}
+        # (host, league) -> tokens granted / weight, and how many threads wait
+        self.granted = {}
+        self.waiting = {}
+        self.condition = threading.Condition()
+
+    def acquire(self, url, league=None):
+        """Block until a request to url's host is allowed, and it is league's turn"""
+        host = urlparse(url).netloc
+        key = (host, league)
+        with self.condition:
+            if not self.waiting.get(key):
+                # A league coming back from idle starts level with the others, not ahead
+                self.granted[key] = max(self.granted.get(key, 0), min(
+                    (self.granted[other] for other, count in self.waiting.items() if count and other[0] == host),
+                    default=0,
+                ))
+            self.waiting[key] = self.waiting.get(key, 0) + 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    tokens, updated = self.buckets.get(host, (self.capacity, now))
+                    tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+                    self.buckets[host] = (tokens, now)
+                    turn = min(
+                        (other for other, count in self.waiting.items() if count and other[0] == host),
+                        key=self.granted.get,
+                    )
+                    if tokens >= 1 and turn == key:
+                        self.buckets[host] = (tokens - 1, now)
+                        self.granted[key] += 1 / self.shares.get(league, 1)
+                        return
+                    # Woken when a token is due, or when the turn moves on
+                    self.condition.wait((1 - tokens) / self.rate if tokens < 1 else None)
+            finally:
+                self.waiting[key] -= 1
+                self.condition.notify_all()
+
+
+DEFAULT_LEAGUES = {
+    "nfl": {"sport": "football"},
+    "nba": {"sport": "basketball"},
+    "mlb": {"sport": "baseball"},
+    "nhl": {"sport": "hockey"},
+}
+
+# Most events ESPN returns for one scoreboard request
+SCOREBOARD_LIMIT = 1000
+
+
+def load_league_registry(path=None):
+    """
+    League registry keyed by the name used in the output. Each entry gives the
+    ESPN sport and league path segments (the league defaults to the key), and
+    may set its own max_workers, scoreboard_params, chunk_days (days per
+    scoreboard request) and share: its weight when leagues compete for the
+    host's requests per second (default 1).
+    Without a config file the four pro leagues are used.
+    """
+    if not path:
+        return {key: dict(entry) for key, entry in DEFAULT_LEAGUES.items()}
+    with open(path, 'r', encoding='utf-8') as f:
+        registry = json.load(f)
+    for key, entry in registry.items():
+        if 'sport' not in entry:
+            raise ValueError(f"League {key} has no ESPN sport")
+    return registry
+
+
+class TeamStandings:
+    """
+    Win/loss records, last-N form and points for/against per team, kept up to
+    date one game at a time: apply() a game as it's stored and remove() it when
+    it ages out, so an update costs only the games that changed.
+    """
+
+    def __init__(self, teams=None):
+        self.teams = teams or {}
+        self.applied = 0
+
+    def to_dict(self):
+        return self.teams
+
+    def results(self, game):
+        """(team key, points for, points against, W/L/T) for each side of a stored game"""
+        scores = game['info'].get('scores', [])
+        if len(scores) != 2 or len(game['team_ids']) != 2:
+            return []
+        points = []
+        for score in scores:
+            try:
+                points.append(float(score.get('score') or 0))
+            except ValueError:
+                return []
+        results = []
+        for side, team_id in enumerate(game['team_ids']):
+            scored, allowed = points[side], points[1 - side]
+            if scores[side].get('winner') or scored > allowed:
+                result = 'W'
+            elif scores[1 - side].get('winner') or scored < allowed:
+                result = 'L'
+            else:
+                result = 'T'
+            results.append((f"{game['league']}:{team_id}", scored, allowed, result))
+        return results
+
+    def apply(self, game):
+        for key, scored, allowed, result in self.results(game):
+            team = self.teams.setdefault(
+                key, {"W": 0, "L": 0, "T": 0, "points_for": 0, "points_against": 0, "results": []}
+            )
+            team[result] += 1
+            team['points_for'] += scored
+            team['points_against'] += allowed
+            bisect.insort(team['results'], [game['info']['date'], game['info']['id'], result])
+        self.applied += 1
+
+    def remove(self, game):
+        for key, scored, allowed, result in self.results(game):
+            team = self.teams[key]
+            team[result] -= 1
+            team['points_for'] -= scored
+            team['points_against'] -= allowed
+            team['results'].remove([game['info']['date'], game['info']['id'], result])
+
+    def table(self, league, form_games=5):
+        """A league's standings, best record first"""
+        rows = []
+        for key, team in self.teams.items():
+            team_league, _, team_id = key.partition(':')
+            games = team['W'] + team['L'] + team['T']
+            if team_league != league or not games:
+                continue
+            recent = [result for _, _, result in team['results']]
+            streak = len(recent) - len(''.join(recent).rstrip(recent[-1]))
+            rows.append({
+                "id": team_id,
+                "wins": team['W'],
+                "losses": team['L'],
+                "ties": team['T'],
+                "games": games,
+                "win_pct": round((team['W'] + team['T'] / 2) / games, 3),
+                "streak": f"{recent[-1]}{streak}",
+                "form": ''.join(reversed(recent[-form_games:])),
+                "points_for_avg": round(team['points_for'] / games, 1),
+                "points_against_avg": round(team['points_against'] / games, 1),
+            })
+        rows.sort(key=lambda row: (-row['win_pct'], row['points_against_avg'] - row['points_for_avg'], row['id']))
+        return rows
+
+
+class GameStore:
+    """
+    Completed games kept between runs, keyed by game id, plus a high-water mark
+    per team (the date of its latest completed game). Completed games never
+    change, so later runs only need to ask ESPN for dates after the mark.
+    """
+
+    def __init__(self, path, retention_days=90):
+        self.path = path
+        self.retention_days = retention_days
+        self.lock = threading.Lock()
+        self.games = {}
+        self.high_water = {}
+        self.team_games = {}
+        self.standings = TeamStandings()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.high_water = data.get('high_water', {})
+        for game_id, game in data.get('games', {}).items():
+            self.index(game_id, game)
+        if 'standings' in data:
+            self.standings = TeamStandings(data['standings'])
+        else:
+            # A store saved before standings existed: build them once
+            for game in self.games.values():
+                self.standings.apply(game)
+        self.standings.applied = 0
+        self.prune()
+
+    def save(self):
+        with self.lock:
+            self.prune()
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "games": self.games, "high_water": self.high_water, "standings": self.standings.to_dict(),
+                }, f)
+        print(f"Game store saved to {self.path} ({len(self.games)} games)")
+
+    def index(self, game_id, game):
+        self.games[game_id] = game
+        for team_id in game['team_ids']:
+            self.team_games.setdefault(f"{game['league']}:{team_id}", set()).add(game_id)
+
+    def prune(self):
+        """Drop games that have aged out of the recent-games window"""
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).strftime("%Y-%m-%d")
+        for game_id in [game_id for game_id, game in self.games.items() if game['info']['date'][:10] < cutoff]:
+            game = self.games.pop(game_id)
+            self.standings.remove(game)
+            for team_id in game['team_ids']:
+                self.team_games.get(f"{game['league']}:{team_id}", set()).discard(game_id)
+
+    def __contains__(self, game_id):
+        with self.lock:
+            return game_id in self.games
+
+    def add(self, league, team_ids, game_info):
+        with self.lock:
+            if game_info['id'] in self.games:
+                return
+            game = {"league": league, "team_ids": team_ids, "info": game_info}
+            self.index(game_info['id'], game)
+            self.standings.apply(game)
+
+    def mark_fetched(self, league, team_ids):
+        """
+        Record that these teams' games are complete up to their latest stored game.
+        Only called after fetching a team's own window: a game stored while
+        fetching an opponent says nothing about the team's earlier games.
+        """
+        with self.lock:
+            for team_id in team_ids:
+                key = f"{league}:{team_id}"
+                dates = [self.games[game_id]['info']['date'] for game_id in self.team_games.get(key, ())]
+                if dates:
+                    self.high_water[key] = max(dates + [self.high_water.get(key, '')])
+
+    def resume_date(self, league, team_ids):
+        """Earliest high-water date across teams, or None if any team has none"""
+        with self.lock:
+            marks = [self.high_water.get(f"{league}:{team_id}") for team_id in team_ids]
+        if not marks or None in marks:
+            return None
+        # Restart on the mark's day: other games that day may not have finished yet
+        return datetime.strptime(min(marks)[:10], "%Y-%m-%d")
+
+    def recent_games(self, league, team_id, limit=5):
+        with self.lock:
+            games = [self.games[game_id]['info'] for game_id in self.team_games.get(f"{league}:{team_id}", ())]
+        games.sort(key=lambda x: x.get('date', ''), reverse=True)
+        return games[:limit]
+
+
+class CollectionCheckpoint:
+    """
+    Finished team records saved while collect_all_data runs, so a run cut short
+    (a Lambda timeout, a crash) resumes with the teams it hadn't reached.
+    The location is a local path or s3://bucket/key; records older than
+    max_age_hours are fetched again rather than resumed.
+    """
+
+    def __init__(self, location, max_age_hours=6, save_every=10, s3_client=None):
+        self.location = location
+        self.max_age = timedelta(hours=max_age_hours)
+        self.save_every = save_every
+        self.s3_client = s3_client
+        if location.startswith("s3://") and s3_client is None:
+            import boto3
+            self.s3_client = boto3.client('s3')
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.teams = {}
+        self.pending = 0
+        self.load()
+
+    def s3_location(self):
+        bucket, _, key = self.location[len("s3://"):].partition("/")
+        return bucket, key
+
+    def load(self):
+        try:
+            if self.s3_client is not None:
+                bucket, key = self.s3_location()
+                body = self.s3_client.get_object(Bucket=bucket, Key=key)['Body'].read()
+                data = json.loads(body.decode('utf-8'))
+            else:
+                with open(self.location, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+        except Exception as e:
+            print(f"No checkpoint found at {self.location} or error: {str(e)}")
+            return
+        cutoff = (datetime.now() - self.max_age).isoformat()
+        self.teams = {key: record for key, record in data.get('teams', {}).items() if record['saved'] >= cutoff}
+        print(f"Resuming from checkpoint {self.location} ({len(self.teams)} teams)")
+
+    def save(self):
+        with self.save_lock:
+            with self.lock:
+                body = json.dumps({"teams": self.teams})
+                self.pending = 0
+            if self.s3_client is not None:
+                bucket, key = self.s3_location()
+                self.s3_client.put_object(Bucket=bucket, Key=key, Body=body, ContentType='application/json')
+            else:
+                with open(self.location, 'w', encoding='utf-8') as f:
+                    f.write(body)
+
+    def clear(self):
+        """Forget the checkpoint once a run completes, so the next run starts fresh"""
+        with self.lock:
+            self.teams = {}
+        if self.s3_client is not None:
+            bucket, key = self.s3_location()
+            self.s3_client.delete_object(Bucket=bucket, Key=key)
+        elif os.path.exists(self.location):
+            os.remove(self.location)
+
+    def get(self, league, team_id):
+        with self.lock:
+            record = self.teams.get(f"{league}:{team_id}")
+        return record['team'] if record else None
+
+    def put(self, league, team_id, team_data):
+        with self.lock:
+            self.teams[f"{league}:{team_id}"] = {"saved": datetime.now().isoformat(), "team": team_data}
+            self.pending += 1
+            due = self.pending >= self.save_every
+            if due:
+                # Claimed here, so workers finishing during the upload don't start their own
+                self.pending = 0
+        if due:
+            self.save()
+
+
+class RosterCache:
+    """
+    Each team's parsed roster from the last run, with a fingerprint of the raw
+    roster response and the validators ESPN sent with it. A roster that comes
+    back unchanged (304, or the same bytes) is reused instead of parsed again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.changed = False
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            return
+
+    def save(self):
+        # Quiet days change nothing, and then the file isn't rewritten either
+        with self.lock:
+            if not self.changed:
+                return
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f)
+            self.changed = False
+        print(f"Roster cache saved to {self.path} ({len(self.entries)} teams)")
+
+    def get(self, league, team_id):
+        with self.lock:
+            return self.entries.get(f"{league}:{team_id}")
+
+    def put(self, league, team_id, fingerprint, response, roster):
+        with self.lock:
+            self.entries[f"{league}:{team_id}"] = {
+                "fingerprint": fingerprint,
+                "etag": response.headers.get('ETag'),
+                "last_modified": response.headers.get('Last-Modified'),
+                "roster": roster,
+            }
+            self.changed = True
+
+
+def normalize_sports_data(all_data):
+    """
+    Move every game into a top-level "games" table keyed by id and replace each
+    team's recent_games with a list of game ids, so shared games appear once.
+    """
+    normalized = {"games": {}}
+    for league, league_data in all_data.items():
+        teams = []
+        for team in league_data['teams']:
+            team = dict(team)
+            if 'recent_games' in team:
+                for game in team['recent_games']:
+                    normalized['games'][game['id']] = game
+                team['recent_games'] = [game['id'] for game in team['recent_games']]
+            teams.append(team)
+        normalized[league] = {**league_data, "teams": teams}
+    return normalized
+
+
+def expand_sports_data(normalized):
+    """Rebuild the nested per-team shape from normalize_sports_data output"""
+    games = normalized['games']
+    expanded = {}
+    for league, league_data in normalized.items():
+        if league == 'games':
+            continue
+        teams = []
+        for team in league_data['teams']:
+            team = dict(team)
+            if 'recent_games' in team:
+                team['recent_games'] = [games[game_id] for game_id in team['recent_games']]
+            teams.append(team)
+        expanded[league] = {**league_data, "teams": teams}
+    return expanded
+
+
+class LiveGameTracker:
+    """
+    Last seen score and status of every game on the polled scoreboards. Each
+    poll is turned into a delta holding only the games that changed since the
+    previous one; snapshot() is the full state the deltas apply on top of.
+    """
+
     def __init__(self):
-        self.base_url = "https://site.api.espn.com/apis/site/v2/sports"
-        self.leagues = {
-            "nfl": {"name": "Football", "abbrev": "nfl"},
-            "nba": {"name": "Basketball", "abbrev": "nba"}, 
-            "mlb": {"name": "Baseball", "abbrev": "mlb"},
-            "nhl": {"name": "Hockey", "abbrev": "nhl"}
+        self.games = {}
+        self.sequence = 0
+
+    def game_state(self, league, game):
+        status = game.get('status', {}).get('type', {})
+        competitions = game.get('competitions') or [{}]
+        return {
+            "id": game.get('id', ''),
+            "league": league,
+            "date": game.get('date', ''),
+            "shortName": game.get('shortName', ''),
+            "state": status.get('state', ''),
+            "detail": status.get('shortDetail', status.get('detail', '')),
+            "completed": status.get('completed', False),
+            "scores": {
+                competitor.get('team', {}).get('id', competitor.get('id')): competitor.get('score', '')
+                for competitor in competitions[0].get('competitors', [])
+            },
         }
+
+    def update(self, league, events):
+        """Replace a league's games with a fresh scoreboard; returns the changes"""
+        changes = []
+        seen = set()
+        for game in events:
+            state = self.game_state(league, game)
+            seen.add(state['id'])
+            previous = self.games.get(state['id'])
+            if previous is None:
+                change = "new"
+            elif previous['scores'] != state['scores']:
+                change = "score"
+            elif (previous['state'], previous['detail']) != (state['state'], state['detail']):
+                change = "status"
+            else:
+                continue
+            self.games[state['id']] = state
+            changes.append({"change": change, **state})
+        # Games that dropped off the scoreboard (yesterday's) aren't live any more
+        for game_id in [game_id for game_id, game in self.games.items()
+                        if game['league'] == league and game_id not in seen]:
+            del self.games[game_id]
+        return changes
+
+    def is_active(self, league, horizon):
+        """Whether a league has a game in progress or starting before `horizon`"""
+        for game in self.games.values():
+            # Postponed and cancelled games are 'post' without being completed
+            if game['league'] != league or game['completed'] or game['state'] == 'post':
+                continue
+            if game['state'] == 'in' or game['date'][:16] <= horizon.strftime("%Y-%m-%dT%H:%M"):
+                return True
+        return False
+
+    def delta(self, changes):
+        self.sequence += 1
+        return {"sequence": self.sequence, "updated": datetime.now().isoformat(), "changes": changes}
+
+    def snapshot(self):
+        return {"sequence": self.sequence, "updated": datetime.now().isoformat(), "games": dict(self.games)}
+
+
+class LiveFilePublisher:
+    """Writes live documents to a directory: one file per delta, full state to live-full.json"""
+
+    def __init__(self, directory="espn_live"):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def __call__(self, kind, document):
+        if kind == "full":
+            filename = os.path.join(self.directory, "live-full.json")
+        else:
+            filename = os.path.join(self.directory, f"live-delta-{document['sequence']:06d}.json")
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(document, f)
+
+
+class ESPNDataFetcher:
+    def __init__(self, max_workers=8, requests_per_second=10, bulk_games=False,
+                 game_store=None, checkpoint=None, leagues=None, roster_cache=None,
+                 base_url="https://site.api.espn.com/apis/site/v2/sports"):
+        self.base_url = base_url
+        # Pull recent games from league scoreboards instead of per-team schedules
+        self.bulk_games = bulk_games
+        # Optional GameStore; when set, only dates after each team's last
+        # completed game are requested
+        self.game_store = game_store
+        # Optional CollectionCheckpoint; teams it already holds are not refetched
+        self.checkpoint = checkpoint
+        # Optional RosterCache; unchanged rosters are reused rather than re-parsed
+        self.roster_cache = roster_cache
+        self.stats = {"rosters_rebuilt": 0, "rosters_reused": 0, "rosters_not_modified": 0, "live_poll_errors": 0,
+                      "scoreboard_splits": 0}
+        self.stats_lock = threading.Lock()
+        self.leagues = leagues or load_league_registry()
+        # Each league's teams run on its own thread pool (max_workers unless the
+        # registry says otherwise). Every league shares ESPN's requests_per_second,
+        # split by the registry's shares while leagues compete for it
+        self.max_workers = max_workers
+        self.rate_limiter = HostRateLimiter(
+            requests_per_second, shares={league: entry.get('share', 1) for league, entry in self.leagues.items()},
+        )
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max_workers + sum(self.league_workers(league) for league in self.leagues))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         self.all_data = {}
+        self.league_report = {}
+        self.search_index = None
+
+    def count(self, stat):
+        with self.stats_lock:
+            self.stats[stat] += 1
+
+    def get_run_report(self):
+        """Summarize the last collect_all_data run"""
+        report = {**self.stats, "leagues": self.league_report}
+        if self.game_store is not None:
+            report['standings_games_applied'] = self.game_store.standings.applied
+        return report
+
+    def league_workers(self, league):
+        return self.leagues[league].get('max_workers', self.max_workers)
+
+    def league_url(self, league, path):
+        entry = self.leagues[league]
+        return f"{self.base_url}/{entry['sport']}/{entry.get('league', league)}/{path}"
+
+    def get(self, url, params=None, league=None, headers=None):
+        """Rate-limited GET over the pooled session"""
+        self.rate_limiter.acquire(url, league)
+        return self.session.get(url, params=params, headers=headers, timeout=30)
         
     def fetch_teams(self, league):
         """Fetch all teams for a given league"""
-        url = f"{self.base_url}/{self.leagues[league]['name'].lower()}/{league}/teams"
-        response = requests.get(url)
+        url = self.league_url(league, "teams")
+        # College leagues have hundreds of teams; the default page is 50
+        response = self.get(url, params={"limit": 1000}, league=league)
         if response.status_code == 200:
             return response.json()
         else:
@@ -27,8 +596,8 @@ class ESPNDataFetcher:
     
     def fetch_team_details(self, league, team_id):
         """Fetch detailed info for a specific team"""
-        url = f"{self.base_url}/{self.leagues[league]['name'].lower()}/{league}/teams/{team_id}"
-        response = requests.get(url)
+        url = self.league_url(league, f"teams/{team_id}")
+        response = self.get(url, league=league)
         if response.status_code == 200:
             return response.json()
         else:
@@ -37,30 +606,64 @@ class ESPNDataFetcher:
     
     def fetch_roster(self, league, team_id):
         """Fetch roster info for a specific team"""
-        url = f"{self.base_url}/{self.leagues[league]['name'].lower()}/{league}/teams/{team_id}/roster"
-        response = requests.get(url)
+        url = self.league_url(league, f"teams/{team_id}/roster")
+        response = self.get(url, league=league)
         if response.status_code == 200:
             return response.json()
         else:
             print(f"Error fetching roster for team {team_id}: {response.status_code}")
             return None
+
+    def get_roster(self, league, team_id):
+        """Parsed roster for a team, reused from the roster cache when ESPN's copy is unchanged"""
+        if self.roster_cache is None:
+            self.count("rosters_rebuilt")
+            return self.parse_roster(self.fetch_roster(league, team_id))
+
+        cached = self.roster_cache.get(league, team_id)
+        headers = {}
+        if cached and cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached and cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+
+        url = self.league_url(league, f"teams/{team_id}/roster")
+        response = self.get(url, league=league, headers=headers)
+        if response.status_code == 304 and cached:
+            self.count("rosters_not_modified")
+            return cached['roster']
+        if response.status_code != 200:
+            print(f"Error fetching roster for team {team_id}: {response.status_code}")
+            return None
+
+        fingerprint = hashlib.sha1(response.content).hexdigest()
+        if cached and cached['fingerprint'] == fingerprint:
+            self.count("rosters_reused")
+            # Same roster, but keep any validators ESPN has started sending
+            if (response.headers.get('ETag'), response.headers.get('Last-Modified')) != (cached['etag'], cached['last_modified']):
+                self.roster_cache.put(league, team_id, fingerprint, response, cached['roster'])
+            return cached['roster']
+        self.count("rosters_rebuilt")
+        roster = self.parse_roster(response.json())
+        self.roster_cache.put(league, team_id, fingerprint, response, roster)
+        return roster
     
-    def fetch_recent_games(self, league, team_id, limit=5):
-        """Fetch the last 5 games for a team"""
+    def fetch_recent_games(self, league, team_id, limit=5, start_date=None):
+        """Fetch the last `limit` games for a team, or all of them when limit is None"""
         # Get current date and date 3 months ago for search range
         end_date = datetime.now()
-        start_date = end_date - timedelta(days=90)
+        start_date = max(start_date or datetime.min, end_date - timedelta(days=90))
         
         # Format dates for the API
         start_str = start_date.strftime("%Y%m%d")
         end_str = end_date.strftime("%Y%m%d")
         
-        url = f"{self.base_url}/{self.leagues[league]['name'].lower()}/{league}/teams/{team_id}/schedule"
+        url = self.league_url(league, f"teams/{team_id}/schedule")
         params = {
             "dates": f"{start_str}-{end_str}",
         }
         
-        response = requests.get(url, params=params)
+        response = self.get(url, params=params, league=league)
         if response.status_code == 200:
             games_data = response.json()
             recent_games = []
@@ -79,99 +682,372 @@ class ESPNDataFetcher:
             print(f"Error fetching games for team {team_id}: {response.status_code}")
             return []
     
+    def request_scoreboard(self, league, start_date, end_date):
+        url = self.league_url(league, "scoreboard")
+        params = {
+            "dates": f"{start_date.strftime('%Y%m%d')}-{end_date.strftime('%Y%m%d')}",
+            "limit": SCOREBOARD_LIMIT,
+            # e.g. {"groups": "80"}: college scoreboards default to ranked teams only
+            **self.leagues[league].get('scoreboard_params', {}),
+        }
+        return self.get(url, params=params, league=league)
+
+    def fetch_scoreboard(self, league, start_date, end_date):
+        """
+        Fetch every game in a league between two dates. A full page may have been
+        cut off at the limit, so its dates are split in two and fetched again.
+        """
+        response = self.request_scoreboard(league, start_date, end_date)
+        if response.status_code != 200:
+            print(f"Error fetching {league} scoreboard: {response.status_code}")
+            return []
+        events = response.json().get('events', [])
+        if len(events) < SCOREBOARD_LIMIT:
+            return events
+
+        days = (end_date.date() - start_date.date()).days
+        if days < 1:
+            print(f"Warning: {league} scoreboard for {start_date.strftime('%Y-%m-%d')} "
+                  f"hit the {SCOREBOARD_LIMIT}-event limit; some games may be missing")
+            return events
+        self.count('scoreboard_splits')
+        middle = start_date + timedelta(days=days // 2)
+        return (self.fetch_scoreboard(league, start_date, middle)
+                + self.fetch_scoreboard(league, middle + timedelta(days=1), end_date))
+
+    def get_recent_games(self, league, team_id, limit=5):
+        """Parsed recent games for a team, from the game store when there is one"""
+        if self.game_store is None:
+            return [self.parse_game(game) for game in self.fetch_recent_games(league, team_id, limit)]
+
+        # Standings and the high-water mark need every completed game in the
+        # window, not just the ones shown; the store slices them at read time
+        start_date = self.game_store.resume_date(league, [team_id])
+        for game in self.fetch_recent_games(league, team_id, None, start_date):
+            self.store_game(league, game)
+        self.game_store.mark_fetched(league, [team_id])
+        return self.game_store.recent_games(league, team_id, limit)
+
+    def store_game(self, league, game):
+        # Games already in the store were parsed on an earlier run
+        if self.is_completed(game) and game['id'] not in self.game_store:
+            self.game_store.add(league, self.game_team_ids(game), self.parse_game(game))
+
+    def fetch_league_games(self, league, team_ids=(), days=90, chunk_days=30, limit=5):
+        """
+        Fetch a league's games over the last `days` in a few scoreboard calls and
+        index the completed ones by team id, parsed and most recent first. Each
+        game is downloaded once, however many teams played in it.
+        """
+        # Busy leagues set smaller chunks so a request rarely needs splitting
+        chunk_days = self.leagues[league].get('chunk_days', chunk_days)
+        end_date = datetime.now()
+        window_start = end_date - timedelta(days=days)
+        if self.game_store is not None:
+            window_start = max(window_start, self.game_store.resume_date(league, team_ids) or window_start)
+
+        games = {}
+        chunk_end = end_date
+        while chunk_end >= window_start:
+            chunk_start = max(chunk_end - timedelta(days=chunk_days - 1), window_start)
+            for game in self.fetch_scoreboard(league, chunk_start, chunk_end):
+                games[game['id']] = game
+            chunk_end = chunk_start - timedelta(days=1)
+
+        if self.game_store is not None:
+            for game in games.values():
+                self.store_game(league, game)
+            self.game_store.mark_fetched(league, team_ids)
+            return {team_id: self.game_store.recent_games(league, team_id, limit) for team_id in team_ids}
+
+        games_by_team = {}
+        for game in games.values():
+            if not self.is_completed(game):
+                continue
+            game_info = self.parse_game(game)
+            for team_id in self.game_team_ids(game):
+                games_by_team.setdefault(team_id, []).append(game_info)
+        for team_games in games_by_team.values():
+            team_games.sort(key=lambda x: x.get('date', ''), reverse=True)
+        return games_by_team
+
+    def poll_live(self, publish, interval=30, idle_interval=600, compact_every=20, max_polls=None):
+        """
+        Keep the live scores fresh without rebuilding the dataset. Only leagues
+        with a game in progress (or about to start) are polled every `interval`
+        seconds; quiet leagues are rechecked every `idle_interval`. Each poll that
+        changes anything is published as a small delta, and the full state is
+        republished after every `compact_every` deltas so readers can catch up.
+        """
+        tracker = LiveGameTracker()
+        next_poll = {league: 0 for league in self.leagues}
+        deltas_since_full = 0
+        polls = 0
+
+        def fetch_board(league):
+            # None means the poll failed; the league keeps its last known games
+            # rather than having them dropped and republished as new next time
+            today = datetime.now()
+            try:
+                # Yesterday too, so games running past midnight stay on the board
+                response = self.request_scoreboard(league, today - timedelta(days=1), today)
+                if response.status_code == 200:
+                    return response.json().get('events', [])
+                print(f"Error polling {league} scoreboard: {response.status_code}")
+            except Exception as e:
+                print(f"Error polling {league} scoreboard: {str(e)}")
+            self.count("live_poll_errors")
+            return None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while max_polls is None or polls < max_polls:
+                now = time.monotonic()
+                due = [league for league, when in next_poll.items() if when <= now]
+                boards = executor.map(fetch_board, due)
+
+                changes = []
+                horizon = datetime.now(timezone.utc) + timedelta(seconds=idle_interval)
+                for league, events in zip(due, boards):
+                    if events is None:
+                        # Retry soon, whether or not the league was active
+                        next_poll[league] = now + interval
+                        continue
+                    changes.extend(tracker.update(league, events))
+                    active = tracker.is_active(league, horizon)
+                    next_poll[league] = now + (interval if active else idle_interval)
+                polls += 1
+
+                # The first poll is all "new" games; the full state says the same thing
+                if changes and polls > 1:
+                    publish("delta", tracker.delta(changes))
+                    deltas_since_full += 1
+                if polls == 1 or deltas_since_full >= compact_every:
+                    publish("full", tracker.snapshot())
+                    deltas_since_full = 0
+
+                if max_polls is None or polls < max_polls:
+                    time.sleep(max(0, min(next_poll.values()) - time.monotonic()))
+        return tracker
+
+    def parse_game(self, game):
+        """Shape a raw ESPN event into the published game record"""
+        game_info = {
+            "id": game.get('id', ''),
+            "date": game.get('date', ''),
+            "name": game.get('name', ''),
+            "shortName": game.get('shortName', ''),
+            "venue": game.get('competitions', [{}])[0].get('venue', {}).get('fullName', '') if game.get('competitions') else '',
+        }
+
+        # Add score information
+        if game.get('competitions') and len(game['competitions']) > 0:
+            competition = game['competitions'][0]
+            if 'competitors' in competition and len(competition['competitors']) > 0:
+                game_info['scores'] = []
+                for competitor in competition['competitors']:
+                    score_info = {
+                        "team": competitor.get('team', {}).get('displayName', ''),
+                        "score": competitor.get('score', ''),
+                        "winner": competitor.get('winner', False),
+                    }
+                    game_info['scores'].append(score_info)
+
+        return game_info
+
+    def game_team_ids(self, game):
+        competitions = game.get('competitions') or [{}]
+        return [
+            competitor.get('team', {}).get('id', competitor.get('id'))
+            for competitor in competitions[0].get('competitors', [])
+        ]
+
+    def is_completed(self, game):
+        return game.get('status', {}).get('type', {}).get('completed', False)
+
+    def parse_roster(self, roster_data):
+        """Shape a raw ESPN roster response into the published player records"""
+        if not roster_data or 'athletes' not in roster_data:
+            return None
+        roster = []
+        for athlete in roster_data['athletes']:
+            # Pro rosters group players by position; college and soccer
+            # rosters are a flat list of players
+            for player in athlete.get('items', [athlete] if 'fullName' in athlete else []):
+                player_info = {
+                    "id": player.get('id', ''),
+                    "fullName": player.get('fullName', ''),
+                    "jersey": player.get('jersey', ''),
+                    "position": player.get('position', {}).get('abbreviation', ''),
+                    "headshot": player.get('headshot', {}).get('href', '') if player.get('headshot') else '',
+                    "height": player.get('height', ''),
+                    "weight": player.get('weight', ''),
+                    "age": player.get('age', ''),
+                    "experience": player.get('experience', {}).get('years', 0) if player.get('experience') else 0,
+                }
+                roster.append(player_info)
+        return roster
+
+    def build_team_data(self, team_info, roster, recent_games):
+        """Shape one team's ESPN data into the published team record"""
+        team_id = team_info['id']
+
+        # Get basic team info
+        team_data = {
+            "id": team_id,
+            "name": team_info['displayName'],
+            "abbreviation": team_info.get('abbreviation', ''),
+            "nickname": team_info.get('nickname', ''),
+            "location": team_info.get('location', ''),
+            "logo": team_info.get('logos', [{}])[0].get('href', '') if team_info.get('logos') else '',
+            "colors": team_info.get('colors', []),
+            "record": team_info.get('record', {}).get('items', [{}])[0].get('summary', '') if team_info.get('record') else '',
+            "links": team_info.get('links', []),
+        }
+
+        # Get detailed roster information (already parsed with parse_roster)
+        if roster is not None:
+            team_data['roster'] = roster
+
+        # Get recent games (already parsed with parse_game)
+        if recent_games:
+            team_data['recent_games'] = list(recent_games)
+
+        return team_data
+
+    def fetch_team_data(self, league, team_info, league_games=None, limit=5):
+        """Fetch a team's roster and recent games; runs on a worker thread"""
+        if self.checkpoint is not None:
+            team_data = self.checkpoint.get(league, team_info['id'])
+            if team_data is not None:
+                return team_data
+
+        print(f"  Processing {team_info['displayName']}...")
+        roster = self.get_roster(league, team_info['id'])
+        if league_games is not None:
+            # Future for the league's scoreboard game index
+            recent_games = league_games.result().get(team_info['id'], [])[:limit]
+        else:
+            recent_games = self.get_recent_games(league, team_info['id'], limit)
+        team_data = self.build_team_data(team_info, roster, recent_games)
+        if self.checkpoint is not None:
+            self.checkpoint.put(league, team_info['id'], team_data)
+        return team_data
+
     def collect_all_data(self):
         """Collect data for all leagues and teams"""
-        for league in self.leagues:
-            print(f"Fetching {league.upper()} data...")
-            self.all_data[league] = {"teams": []}
-            
-            teams_data = self.fetch_teams(league)
-            if not teams_data or 'sports' not in teams_data:
-                continue
-                
-            # Process each team
-            for team in teams_data['sports'][0]['leagues'][0]['teams']:
-                team_info = team['team']
-                team_id = team_info['id']
-                
-                print(f"  Processing {team_info['displayName']}...")
-                
-                # Get basic team info
-                team_data = {
-                    "id": team_id,
-                    "name": team_info['displayName'],
-                    "abbreviation": team_info.get('abbreviation', ''),
-                    "nickname": team_info.get('nickname', ''),
-                    "location": team_info.get('location', ''),
-                    "logo": team_info.get('logos', [{}])[0].get('href', '') if team_info.get('logos') else '',
-                    "colors": team_info.get('colors', []),
-                    "record": team_info.get('record', {}).get('items', [{}])[0].get('summary', '') if team_info.get('record') else '',
-                    "links": team_info.get('links', []),
+        try:
+            self.collect_leagues()
+        except BaseException:
+            # Keep whatever finished for the next run to resume from
+            if self.checkpoint is not None:
+                self.checkpoint.save()
+            raise
+        if self.checkpoint is not None:
+            self.checkpoint.clear()
+        self.search_index = PlayerSearchIndex.from_sports_data(self.all_data)
+
+        if self.game_store is not None:
+            self.game_store.save()
+        if self.roster_cache is not None:
+            self.roster_cache.save()
+        print(f"Rosters: {self.stats['rosters_rebuilt']} rebuilt, {self.stats['rosters_reused']} reused, "
+              f"{self.stats['rosters_not_modified']} not modified")
+
+    def collect_leagues(self):
+        with contextlib.ExitStack() as stack:
+            executor = stack.enter_context(ThreadPoolExecutor(max_workers=self.max_workers))
+            # Team lists first, so every league's teams can be fetched side by side
+            team_lists = dict(zip(self.leagues, executor.map(self.fetch_teams, self.leagues)))
+            league_teams = {}
+            for league, teams_data in team_lists.items():
+                if not teams_data or 'sports' not in teams_data:
+                    league_teams[league] = []
+                    continue
+                league_teams[league] = [team['team'] for team in teams_data['sports'][0]['leagues'][0]['teams']]
+
+            # Scoreboards go on the shared pool, so team jobs waiting on them can't starve them
+            league_games = {}
+            if self.bulk_games:
+                for league in self.leagues:
+                    # A league the checkpoint already holds doesn't need its scoreboards
+                    pending = [
+                        team_info['id'] for team_info in league_teams[league]
+                        if self.checkpoint is None or self.checkpoint.get(league, team_info['id']) is None
+                    ]
+                    if pending:
+                        league_games[league] = executor.submit(
+                            self.fetch_league_games, league, [team_info['id'] for team_info in league_teams[league]]
+                        )
+
+            # One pool per league, so a league of hundreds of college teams can't
+            # hold every worker while the small leagues wait behind it
+            start_time = time.monotonic()
+            finished = {}
+            team_futures = {}
+            for league in self.leagues:
+                print(f"Fetching {league.upper()} data...")
+                league_executor = stack.enter_context(ThreadPoolExecutor(max_workers=self.league_workers(league)))
+                team_futures[league] = [
+                    league_executor.submit(self.fetch_team_data, league, team_info, league_games.get(league))
+                    for team_info in league_teams[league]
+                ]
+                for future in team_futures[league]:
+                    future.add_done_callback(lambda _, league=league: finished.__setitem__(league, time.monotonic()))
+
+            # Collect in submission order so the output matches a serial run
+            for league in self.leagues:
+                self.all_data[league] = {"teams": [future.result() for future in team_futures[league]]}
+                if self.game_store is not None:
+                    with self.game_store.lock:
+                        self.all_data[league]['standings'] = self.game_store.standings.table(league)
+                elapsed = finished.get(league, start_time) - start_time
+                self.league_report[league] = {
+                    "teams": len(team_futures[league]),
+                    "seconds": round(elapsed, 2),
+                    "teams_per_second": round(len(team_futures[league]) / elapsed, 1) if elapsed else 0,
                 }
-                
-                # Get detailed roster information
-                roster_data = self.fetch_roster(league, team_id)
-                if roster_data and 'athletes' in roster_data:
-                    team_data['roster'] = []
-                    for athlete in roster_data['athletes']:
-                        if 'items' in athlete:
-                            for player in athlete['items']:
-                                player_info = {
-                                    "id": player.get('id', ''),
-                                    "fullName": player.get('fullName', ''),
-                                    "jersey": player.get('jersey', ''),
-                                    "position": player.get('position', {}).get('abbreviation', ''),
-                                    "headshot": player.get('headshot', {}).get('href', '') if player.get('headshot') else '',
-                                    "height": player.get('height', ''),
-                                    "weight": player.get('weight', ''),
-                                    "age": player.get('age', ''),
-                                    "experience": player.get('experience', {}).get('years', 0) if player.get('experience') else 0,
-                                }
-                                team_data['roster'].append(player_info)
-                
-                # Get recent games
-                recent_games = self.fetch_recent_games(league, team_id)
-                if recent_games:
-                    team_data['recent_games'] = []
-                    for game in recent_games:
-                        game_info = {
-                            "id": game.get('id', ''),
-                            "date": game.get('date', ''),
-                            "name": game.get('name', ''),
-                            "shortName": game.get('shortName', ''),
-                            "venue": game.get('competitions', [{}])[0].get('venue', {}).get('fullName', '') if game.get('competitions') else '',
-                        }
-                        
-                        # Add score information
-                        if game.get('competitions') and len(game['competitions']) > 0:
-                            competition = game['competitions'][0]
-                            if 'competitors' in competition and len(competition['competitors']) > 0:
-                                game_info['scores'] = []
-                                for competitor in competition['competitors']:
-                                    score_info = {
-                                        "team": competitor.get('team', {}).get('displayName', ''),
-                                        "score": competitor.get('score', ''),
-                                        "winner": competitor.get('winner', False),
-                                    }
-                                    game_info['scores'].append(score_info)
-                        
-                        team_data['recent_games'].append(game_info)
-                
-                # Add a small delay to avoid hitting rate limits
-                time.sleep(0.2)
-                
-                # Add team data to the league
-                self.all_data[league]['teams'].append(team_data)
-            
-            print(f"Completed {league.upper()} data collection")
-    
-    def save_to_json(self, filename="espn_sports_data.json"):
+                print(f"Completed {league.upper()} data collection "
+                      f"({self.league_report[league]['teams_per_second']} teams/s)")
+
+    def save_to_json(self, filename="espn_sports_data.json", normalized=False):
         """Save all collected data to a JSON file"""
+        data = normalize_sports_data(self.all_data) if normalized else self.all_data
         with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(self.all_data, f, indent=2)
+            json.dump(data, f, indent=2)
         print(f"Data saved to {filename}")
 
+    def save_search_index(self, filename="espn_player_search.json"):
+        """Save the player search index built by collect_all_data"""
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.search_index.to_dict(), f)
+        print(f"Player search index saved to {filename}")
+
 if __name__ == "__main__":
-    fetcher = ESPNDataFetcher()
-    fetcher.collect_all_data()
-    fetcher.save_to_json()
+    # Requests per second to ESPN across every league. This cap, not the number
+    # of workers or a league's share, is what bounds a full crawl
+    requests_per_second = float(os.environ.get("ESPN_REQUESTS_PER_SECOND", 10))
+    if os.environ.get("ESPN_LIVE"):
+        fetcher = ESPNDataFetcher(
+            requests_per_second=requests_per_second,
+            leagues=load_league_registry(os.environ.get("ESPN_LEAGUES_CONFIG")),
+        )
+        fetcher.poll_live(
+            LiveFilePublisher(os.environ.get("ESPN_LIVE_DIR", "espn_live")),
+            interval=float(os.environ.get("ESPN_LIVE_INTERVAL", 30)),
+        )
+    else:
+        game_store = GameStore(os.environ.get("ESPN_GAME_STORE", "espn_game_store.json"))
+        checkpoint = None
+        if os.environ.get("ESPN_CHECKPOINT"):
+            checkpoint = CollectionCheckpoint(
+                os.environ["ESPN_CHECKPOINT"],
+                max_age_hours=float(os.environ.get("ESPN_CHECKPOINT_MAX_AGE_HOURS", 6)),
+            )
+        fetcher = ESPNDataFetcher(
+            requests_per_second=requests_per_second, bulk_games=True, game_store=game_store, checkpoint=checkpoint,
+            roster_cache=RosterCache(os.environ.get("ESPN_ROSTER_CACHE", "espn_roster_cache.json")),
+            leagues=load_league_registry(os.environ.get("ESPN_LEAGUES_CONFIG")),
+        )
+        fetcher.collect_all_data()
+        fetcher.save_to_json(normalized=os.environ.get("ESPN_OUTPUT_FORMAT") == "normalized")
+        fetcher.save_search_index()
@@ -0,0 +1,249 @@
+import heapq
+import math
+import re
+import unicodedata
+from itertools import chain
+
+# Prefixes of every name token up to this length are indexed; longer query
+# words are narrowed by that prefix and checked against the token itself
+PREFIX_LENGTH = 6
+# Trigram Jaccard similarity a misspelled word needs to match a name token
+MIN_SIMILARITY = 0.4
+
+
+def normalize_name(name):
+    """Lowercase ASCII words: "De'Aaron Fox" -> "deaaron fox", "Luka Dončić" -> "luka doncic" """
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii").lower()
+    name = re.sub(r"['.]", "", name)
+    return " ".join(re.findall(r"[a-z0-9]+", name))
+
+
+def trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def to_bits(numbers, size):
+    """A Python int with bit n set for each n in numbers"""
+    bits = bytearray((size + 7) // 8)
+    for number in numbers:
+        bits[number >> 3] |= 1 << (number & 7)
+    return int.from_bytes(bits, 'little')
+
+
+class PlayerSearchIndex:
+    """
+    Typeahead lookup over every collected roster.
+    Players are numbered in rank order (shorter, then alphabetical names first)
+    and every posting list holds those numbers ascending, so a query intersects
+    its lists and stops after k hits instead of ranking all matches. Query
+    words that start no name token are matched fuzzily against the distinct
+    tokens (far fewer than players) by trigram similarity, counting shared
+    trigrams over a bitmap of tokens per trigram.
+    """
+
+    def __init__(self, players, prefixes=None, vocabulary=None, token_grams=None):
+        # [id, fullName, league, team id, team name, position], in rank order
+        self.players = players
+        self.tokens = [normalize_name(player[1]).split() for player in players]
+        if prefixes is None:
+            prefixes = {}
+            for number, tokens in enumerate(self.tokens):
+                for token in tokens:
+                    for length in range(1, min(PREFIX_LENGTH, len(token)) + 1):
+                        postings = prefixes.setdefault(token[:length], [])
+                        if not postings or postings[-1] != number:
+                            postings.append(number)
+            vocabulary = sorted({token for tokens in self.tokens for token in tokens})
+            token_grams = {}
+            for token_number, token in enumerate(vocabulary):
+                for gram in trigrams(token):
+                    token_grams.setdefault(gram, []).append(token_number)
+        self.prefixes = prefixes
+        self.vocabulary = vocabulary
+        self.token_grams = token_grams
+
+        token_numbers = {token: token_number for token_number, token in enumerate(vocabulary)}
+        self.token_sizes = [len(trigrams(token)) for token in vocabulary]
+        # Bit n of a trigram's bitmap is set when token n has that trigram, and
+        # sizes_up_to[size] has every token with at most `size` trigrams
+        self.gram_bits = {gram: to_bits(postings, len(vocabulary)) for gram, postings in token_grams.items()}
+        by_size = {}
+        for token_number, size in enumerate(self.token_sizes):
+            by_size.setdefault(size, []).append(token_number)
+        self.sizes_up_to = []
+        for size in range(max(self.token_sizes, default=0) + 1):
+            previous = self.sizes_up_to[-1] if self.sizes_up_to else 0
+            self.sizes_up_to.append(previous | to_bits(by_size.get(size, ()), len(vocabulary)))
+        self.token_players = [[] for _ in vocabulary]
+        self.filters = {}
+        for number, (_, _, league, team_id, _, position) in enumerate(players):
+            for token in set(self.tokens[number]):
+                self.token_players[token_numbers[token]].append(number)
+            for key in (("league", league), ("team", f"{league}:{team_id}"), ("position", position)):
+                self.filters.setdefault(key, []).append(number)
+
+    @classmethod
+    def from_sports_data(cls, all_data):
+        """Index every roster in a collect_all_data result"""
+        players = []
+        for league, league_data in all_data.items():
+            for team in league_data.get('teams', []):
+                for player in team.get('roster', []):
+                    players.append([
+                        player['id'], player['fullName'], league, team['id'], team['name'], player['position'],
+                    ])
+        players.sort(key=lambda player: (len(player[1]), player[1], player[2], player[0]))
+        return cls(players)
+
+    def to_dict(self):
+        return {
+            "players": self.players, "prefixes": self.prefixes,
+            "vocabulary": self.vocabulary, "token_grams": self.token_grams,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['players'], data['prefixes'], data['vocabulary'], data['token_grams'])
+
+    def result(self, number, match):
+        player_id, name, league, team_id, team, position = self.players[number]
+        return {
+            "id": player_id, "fullName": name, "league": league,
+            "team_id": team_id, "team": team, "position": position, "match": match,
+        }
+
+    def similar_tokens(self, word):
+        """Name tokens whose trigrams overlap `word`'s enough, with their similarity"""
+        word_grams = trigrams(word)
+        # Shared trigrams per token as a binary number, one bitmap per digit: each
+        # of the word's trigram bitmaps is added in with carries
+        digits = []
+        for gram in word_grams:
+            carry = self.gram_bits.get(gram, 0)
+            for digit, bits in enumerate(digits):
+                if not carry:
+                    break
+                digits[digit], carry = bits ^ carry, bits & carry
+            if carry:
+                digits.append(carry)
+
+        similar = {}
+        most_shared = min(len(word_grams), 2 ** len(digits) - 1)
+        for count in range(math.ceil(MIN_SIMILARITY * len(word_grams)), most_shared + 1):
+            # Jaccard >= MIN_SIMILARITY with `count` shared trigrams bounds the token's size
+            largest = math.floor(count * (1 + MIN_SIMILARITY) / MIN_SIMILARITY - len(word_grams) + 1e-9)
+            if largest < 0:
+                continue
+            matches = self.sizes_up_to[min(largest, len(self.sizes_up_to) - 1)]
+            for digit, bits in enumerate(digits):
+                matches &= bits if count >> digit & 1 else ~bits
+            while matches:
+                lowest = matches & -matches
+                matches ^= lowest
+                token_number = lowest.bit_length() - 1
+                size = self.token_sizes[token_number]
+                similarity = count / (len(word_grams) + size - count)
+                if similarity >= MIN_SIMILARITY:
+                    similar[token_number] = similarity
+        return similar
+
+    def search(self, query, k=10, league=None, team=None, position=None, fuzzy=True):
+        """
+        Top-k players for a partial name. Every query word must start a word of
+        the player's name ("leb jam" finds LeBron James), or with fuzzy on, be
+        close to one ("lebrn jam"). team is a team id and needs league.
+        """
+        words = normalize_name(query).split()
+        if not words:
+            return []
+        filters = [
+            self.filters.get(key, [])
+            for key in (("league", league), ("team", f"{league}:{team}" if team else None), ("position", position))
+            if key[1] is not None
+        ]
+
+        if all(word[:PREFIX_LENGTH] in self.prefixes for word in words):
+            # Posting lists are in rank order: one list is walked as is, several
+            # are intersected first (in C) so a rare word or filter cuts it short
+            lists = sorted([self.prefixes[word[:PREFIX_LENGTH]] for word in words] + filters, key=len)
+            candidates = lists[0] if len(lists) == 1 else sorted(set(lists[0]).intersection(*lists[1:]))
+            long_words = [word for word in words if len(word) > PREFIX_LENGTH]
+            found = []
+            for number in candidates:
+                tokens = self.tokens[number]
+                if all(any(token.startswith(word) for token in tokens) for word in long_words):
+                    found.append(self.result(number, "prefix"))
+                    if len(found) == k:
+                        break
+            if found:
+                return found
+        if not fuzzy:
+            return []
+
+        # Each word scores 1 where it starts a name token, or its similarity to
+        # the closest token; players must match every word one way or the other.
+        # The other words' postings and the filters are intersected up front, and
+        # the word with the most postings is walked best match first: its prefix
+        # list (at most 1), then each similar token's players by falling similarity.
+        # Nobody further on beats that bound plus 1 per other word, so the walk
+        # stops once the k-th best does and "jmes" doesn't score every James
+        similar = []
+        walks = []
+        for word in words:
+            word_similar = self.similar_tokens(word)
+            similar.append({self.vocabulary[token_number]: score for token_number, score in word_similar.items()})
+            walks.append([(1, self.prefixes.get(word[:PREFIX_LENGTH], []))] + sorted(
+                ((score, self.token_players[token_number]) for token_number, score in word_similar.items()),
+                key=lambda group: -group[0],
+            ))
+        walk = max(walks, key=lambda groups: sum(len(postings) for _, postings in groups))
+        allowed = None
+        for groups in walks:
+            if groups is not walk:
+                players = set()
+                for _, postings in groups:
+                    players.update(postings)
+                allowed = players if allowed is None else allowed & players
+        for postings in filters:
+            allowed = set(postings) if allowed is None else allowed.intersection(postings)
+        if allowed is not None and len(allowed) < sum(len(postings) for _, postings in walk):
+            # Fewer players left than the walk would visit ("dearon norgalal j"): keep
+            # those the walked word matches too and score them all
+            walk = [(1, sorted(allowed.intersection(chain.from_iterable(postings for _, postings in walk))))]
+        other_words = len(words) - 1
+
+        # Min-heap of the best k (score, -number) so far, worst on top
+        best = []
+        seen = set()
+        for group, (bound, postings) in enumerate(walk):
+            for number in postings:
+                # Neither this player nor the later (higher numbered) ones here can place
+                if len(best) == k and best[0] > (bound + other_words, -number):
+                    break
+                if number in seen or (allowed is not None and number not in allowed):
+                    continue
+                seen.add(number)
+                score = self.fuzzy_score(number, words, similar)
+                if score:
+                    if len(best) < k:
+                        heapq.heappush(best, (score, -number))
+                    elif (score, -number) > best[0]:
+                        heapq.heapreplace(best, (score, -number))
+            # Players in later lists may rank higher on a tie, so stop only when they can't tie
+            if len(best) == k and group + 1 < len(walk) and best[0][0] > walk[group + 1][0] + other_words:
+                break
+        return [self.result(-negative, "fuzzy") for _, negative in sorted(best, reverse=True)]
+
+    def fuzzy_score(self, number, words, similar):
+        """Sum of each word's best match in a player's name, or 0 if a word matches nothing"""
+        tokens = self.tokens[number]
+        score = 0
+        for word, word_similar in zip(words, similar):
+            word_score = 1 if any(token.startswith(word) for token in tokens) else max(
+                word_similar.get(token, 0) for token in tokens
+            )
+            if not word_score:
+                return 0
+            score += word_score
+        return score
@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+"""
+Benchmark the weather backfill against a local fake OpenWeatherMap.
+
+The fake server answers the historical (timemachine) endpoint after a fixed
+latency and enforces a per-minute quota, answering 429 when it is exceeded, so
+the run shows whether the backfill reaches the quota ceiling without going over.
+Time is scaled: a quota "minute" lasts --minute seconds.
+--coverage YEARS times coverage-index queries against a walk of the nested data.
+--history YEARS compares the columnar history store with the nested data.
+--fill YEARS compares the batch fill generator with the per-day one it replaced.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import main
+import numpy as np
+
+from coverage_index import CoverageIndex
+from fill_generator import derive_days, simulate_days
+from history_store import FIELDS, WeatherHistoryStore
+
+
+class FakeOpenWeatherMap:
+    def __init__(self, latency=0.05, per_minute=120, minute=1.0):
+        self.latency = latency
+        self.per_minute = per_minute
+        self.minute = minute
+        self.calls = deque()
+        self.request_count = 0
+        self.throttled = 0
+        self.lock = threading.Lock()
+        self.httpd = None
+        self.base = None
+
+    def historical(self, query):
+        timestamp = int(query["dt"][0])
+        day = datetime.datetime.fromtimestamp(timestamp)
+        return {"data": [{
+            "dt": timestamp,
+            "temp": 40 + 30 * abs(day.month - 6.5) / 6.5,
+            "feels_like": 38,
+            "humidity": 40 + day.day,
+            "pressure": 1015,
+            "wind_speed": 5 + day.day % 7,
+            "uvi": 3.5,
+            "visibility": 10000,
+            "sunrise": timestamp - 6 * 3600,
+            "sunset": timestamp + 6 * 3600,
+            "weather": [{"description": "clear sky"}],
+        }]}
+
+    def current(self):
+        now = int(time.time())
+        return {
+            "main": {"temp_min": 50, "temp_max": 70, "humidity": 40, "feels_like": 60, "pressure": 1015},
+            "wind": {"speed": 6},
+            "sys": {"sunrise": now - 6 * 3600, "sunset": now + 6 * 3600},
+            "visibility": 10000,
+            "weather": [{"description": "clear sky"}],
+        }
+
+    def allow(self):
+        """Sliding-window quota, as the plan enforces it"""
+        with self.lock:
+            now = time.monotonic()
+            self.request_count += 1
+            while self.calls and self.calls[0] <= now - self.minute:
+                self.calls.popleft()
+            if len(self.calls) >= self.per_minute:
+                self.throttled += 1
+                return False
+            self.calls.append(now)
+            return True
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(server.latency)
+                url = urlparse(self.path)
+                if url.path.endswith("/weather"):
+                    status, payload = 200, server.current()
+                elif not server.allow():
+                    status, payload = 429, {"cod": 429, "message": "quota exceeded"}
+                else:
+                    status, payload = 200, server.historical(parse_qs(url.query))
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            # The default backlog of 5 drops connections under many workers
+            request_queue_size = 256
+
+        self.httpd = Server(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def stop(self):
+        self.httpd.shutdown()
+
+
+def start_server(args):
+    server = FakeOpenWeatherMap(latency=args.latency, per_minute=args.per_minute, minute=args.minute)
+    server.start()
+    main.HISTORICAL_WEATHER_URL = f"{server.base}/data/3.0/onecall/timemachine"
+    main.CURRENT_WEATHER_URL = f"{server.base}/data/2.5/weather"
+    main.LAT, main.LON = 40.2338, -111.6585
+    return server
+
+
+def benchmark_backfill(args):
+    server = start_server(args)
+    try:
+        yesterday = datetime.datetime.now() - datetime.timedelta(days=1)
+        first_day = yesterday - datetime.timedelta(days=args.days - 1)
+        weather_data = {}
+        # With a budget of every day in the range, the planner picks them all
+        missing = main.plan_weather_fetches(weather_data, first_day, yesterday, args.days, CoverageIndex())
+
+        limiter = main.QuotaLimiter(args.per_minute, args.per_day, minute=args.minute)
+        start_time = time.perf_counter()
+        filled = main.backfill_weather_days(weather_data, missing, limiter=limiter, max_workers=args.workers)
+        elapsed = time.perf_counter() - start_time
+
+        ordered = all(
+            list(days) == sorted(days, key=int)
+            for months in weather_data.values() for days in months.values()
+        )
+        ceiling = args.per_minute / args.minute
+        print(f"missing days:   {len(missing)} (daily quota {args.per_day})")
+        print(f"filled:         {filled} in {elapsed:.2f}s, {server.throttled} throttled responses")
+        print(f"throughput:     {filled / elapsed:.1f} calls/s against a quota ceiling of {ceiling:.1f}/s")
+        print(f"date order:     {ordered}")
+        print(f"sleep(1.2) path would take {filled * (1.2 + args.latency):.0f}s for the same days")
+    finally:
+        server.stop()
+
+
+def benchmark_planner(args):
+    server = start_server(args)
+    try:
+        today = datetime.datetime.now()
+        start_date = datetime.datetime(today.year - 1, 1, 1)
+        weather_data = {}
+        coverage = CoverageIndex()
+        print(f"{'run':>4} {'calls':>6} {'real %':>7} {'real':>6} {'derived':>8} {'simulated':>10}")
+        for run in range(1, args.planner + 1):
+            # A fresh limiter is a fresh day's quota
+            limiter = main.QuotaLimiter(args.per_minute, args.per_day, minute=args.minute)
+            with contextlib.redirect_stdout(io.StringIO()):
+                dates = main.plan_weather_fetches(weather_data, start_date, today, args.per_day, coverage)
+                main.backfill_weather_days(
+                    weather_data, dates, limiter=limiter, max_workers=args.workers, coverage=coverage
+                )
+                main.fill_weather_gaps(weather_data, start_date, today, coverage)
+            report = main.coverage_report(weather_data, start_date, today, limiter.calls_made, coverage)
+            print(f"{run:>4} {report['callsUsed']:>6} {report['coverage']:>7} {report['real']:>6} "
+                  f"{report['derived']:>8} {report['simulated']:>10}")
+    finally:
+        server.stop()
+
+
+def scan_days_to_upgrade(weather_data, start_date, end_date):
+    """The per-day walk over the nested data that the index replaces"""
+    found = []
+    date = start_date
+    while date <= end_date:
+        day_data = weather_data.get(str(date.year), {}).get(date.strftime('%B'), {}).get(str(date.day))
+        if main.day_status(day_data) != 'real':
+            found.append(date)
+        date += datetime.timedelta(days=1)
+    return found
+
+
+def benchmark_coverage(args):
+    # Years of stored days: mostly real, with derived, simulated and missing ones
+    rng = random.Random(7)
+    end_date = datetime.date.today()
+    start_date = datetime.date(end_date.year - args.coverage + 1, 1, 1)
+    weather_data = {}
+    date = start_date
+    while date <= end_date:
+        status = rng.choices(['real', 'derived', 'simulated', 'missing'], [85, 8, 5, 2])[0]
+        if status != 'missing':
+            day_data = {'lowF': 40, status: True} if status != 'real' else {'lowF': 40}
+            weather_data.setdefault(str(date.year), {}).setdefault(date.strftime('%B'), {})[str(date.day)] = day_data
+        date += datetime.timedelta(days=1)
+
+    start_time = time.perf_counter()
+    coverage = CoverageIndex.from_weather_data(weather_data, main.day_status)
+    build_time = time.perf_counter() - start_time
+    saved = CoverageIndex.from_dict(json.loads(json.dumps(coverage.to_dict())))
+
+    start_time = time.perf_counter()
+    for _ in range(args.repeat):
+        scanned = scan_days_to_upgrade(weather_data, start_date, end_date)
+    scan_time = (time.perf_counter() - start_time) / args.repeat
+    start_time = time.perf_counter()
+    for _ in range(args.repeat):
+        indexed = saved.days_to_upgrade(start_date, end_date)
+        counts = saved.count(start_date, end_date)
+    index_time = (time.perf_counter() - start_time) / args.repeat
+
+    print(f"range:            {start_date} to {end_date} ({(end_date - start_date).days + 1} days)")
+    print(f"index build:      {build_time * 1000:.1f}ms, saved as {len(json.dumps(coverage.to_dict()))} bytes")
+    print(f"days to upgrade:  {len(indexed)} ({counts})")
+    print(f"nested-data scan: {scan_time * 1000:.2f}ms per query")
+    print(f"index query:      {index_time * 1000:.2f}ms per query (with counts)")
+    print(f"same days:        {scanned == indexed}")
+
+
+def nested_rollups(weather_data):
+    """Monthly min/max/mean/sum computed over the nested data, as clients had to"""
+    rollups = {}
+    for year, months in weather_data.items():
+        for month, days in months.items():
+            summary = {}
+            for field in FIELDS:
+                values = [day[field] for day in days.values() if day.get(field) is not None]
+                summary[field] = {
+                    'min': min(values), 'max': max(values),
+                    'mean': sum(values) / len(values), 'sum': sum(values),
+                } if values else None
+            rollups.setdefault(year, {})[month] = summary
+    return rollups
+
+
+def benchmark_history(args):
+    end_date = datetime.date.today()
+    date = datetime.date(end_date.year - args.history + 1, 1, 1)
+    weather_data = {}
+    while date <= end_date:
+        weather_data.setdefault(str(date.year), {}).setdefault(date.strftime('%B'), {})[str(date.day)] = \
+            main.simulate_weather_data(date)
+        date += datetime.timedelta(days=1)
+
+    start_time = time.perf_counter()
+    store = WeatherHistoryStore.from_weather_data(weather_data, main.day_status)
+    build_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for _ in range(args.repeat):
+        expected = nested_rollups(weather_data)
+    nested_time = (time.perf_counter() - start_time) / args.repeat
+    start_time = time.perf_counter()
+    for _ in range(args.repeat):
+        monthly = store.rollups('month')
+        yearly = store.rollups('year')
+    store_time = (time.perf_counter() - start_time) / args.repeat
+
+    # float32 columns round-trip to the nested values at their 1-2 decimals
+    agree = all(
+        abs(monthly[year][month][field][name] - expected[year][month][field][name])
+        <= 0.01 * max(1, abs(expected[year][month][field][name]))
+        for year, months in expected.items() for month, summary in months.items()
+        for field in FIELDS for name in ('min', 'max', 'mean', 'sum')
+    )
+    saved = store.to_bytes()
+    exported = WeatherHistoryStore.from_bytes(saved).to_weather_data()
+    round_trip = all(
+        exported[year][month][day][field] == day_data[field]
+        for year, months in weather_data.items() for month, days in months.items()
+        for day, day_data in days.items() for field in FIELDS
+    )
+
+    print(f"days:             {len(store)} ({len(yearly)} years)")
+    print(f"nested JSON:      {len(json.dumps(weather_data)) / 1024:.0f} KiB")
+    print(f"columnar .npz:    {len(saved) / 1024:.0f} KiB, built in {build_time * 1000:.0f}ms")
+    print(f"monthly rollups:  nested {nested_time * 1000:.1f}ms, "
+          f"columnar {store_time * 1000:.1f}ms (monthly + yearly)")
+    print(f"rollups agree:    {agree}")
+    print(f"export round-trip of stored fields: {round_trip}")
+
+
+def per_day_simulate(date, rng):
+    """The per-day simulator fill_weather_gaps called before batching, as the baseline"""
+    month, day = date.month, date.day
+    if month in [12, 1, 2]:
+        low_temp, high_temp = round(10 + (20 * (day / 31)), 1), round(25 + (20 * (day / 31)), 1)
+        forecast_options, precip_max = ['snow', 'cloudy', 'partly cloudy', 'clear'], 0.8
+    elif month in [3, 4, 5]:
+        low_temp, high_temp = round(30 + (25 * (day / 31)), 1), round(45 + (30 * (day / 31)), 1)
+        forecast_options, precip_max = ['rain', 'cloudy', 'partly cloudy', 'clear'], 1.2
+    elif month in [6, 7, 8]:
+        low_temp, high_temp = round(55 + (20 * (day / 31)), 1), round(75 + (20 * (day / 31)), 1)
+        forecast_options, precip_max = ['clear', 'partly cloudy', 'thunderstorm'], 0.6
+    else:
+        low_temp, high_temp = round(35 + (25 * (day / 31)), 1), round(50 + (25 * (day / 31)), 1)
+        forecast_options, precip_max = ['clear', 'partly cloudy', 'cloudy', 'rain'], 0.9
+    rand_factor = rng.random() * 0.4 + 0.8
+    return {
+        'lowF': round(low_temp * rand_factor, 1),
+        'highF': round(high_temp * rand_factor, 1),
+        'precipitation': round(rng.random() * precip_max, 2),
+        'humidity': round(rng.random() * 0.6 + 0.2, 2),
+        'forecast': rng.choice(forecast_options),
+        'wind': round(rng.random() * 15 + 2, 1),
+        'airQuality': round(rng.random() * 0.8 + 0.2, 2),
+        'uvIndex': round(rng.random() * 10, 1),
+        'sunrise': f"{6 + rng.randint(0, 2)}:{rng.randint(10, 59)} AM",
+        'sunset': f"{5 + rng.randint(0, 3)}:{rng.randint(10, 59)} PM",
+        'moonPhase': rng.choice(['New', 'Waxing Crescent', 'First Quarter', 'Waxing Gibbous', 'Full',
+                                 'Waning Gibbous', 'Last Quarter', 'Waning Crescent']),
+        'feelsLike': round((low_temp + high_temp) / 2 * rand_factor, 1),
+        'visibility': round(rng.random() * 8 + 2, 1),
+        'pressure': round(rng.random() * 50 + 980, 1),
+        'simulated': True,
+    }
+
+
+def per_day_derive(sample_data, day, rng):
+    """The per-day sample-based generator fill_weather_gaps called before batching"""
+    day_data = sample_data.copy()
+    day_factor = 0.9 + (day / 30) * 0.2
+    rand_factor = rng.random() * 0.1 + 0.95
+    for field in ('lowF', 'highF', 'feelsLike'):
+        if day_data[field] is not None:
+            day_data[field] = round(day_data[field] * day_factor * rand_factor, 1)
+    if day_data['precipitation'] is not None:
+        day_data['precipitation'] = round(day_data['precipitation'] * (rng.random() * 1.5 + 0.5), 2)
+    if day_data['humidity'] is not None:
+        day_data['humidity'] = min(1.0, round(day_data['humidity'] * (rng.random() * 0.3 + 0.85), 2))
+    if rng.random() < 0.3:
+        day_data['forecast'] = rng.choice(['clear', 'partly cloudy', 'cloudy', 'rain', 'snow', 'thunderstorm'])
+    day_data['derived'] = True
+    return day_data
+
+
+# The per-day generators' value ranges: field -> (lowest, highest, rounding slack)
+SIMULATED_BOUNDS = {
+    'precipitation': (0, 1.2, 0.005), 'humidity': (0.2, 0.8, 0.005), 'wind': (2, 17, 0.05),
+    'airQuality': (0.2, 1.0, 0.005), 'uvIndex': (0, 10, 0.05), 'visibility': (2, 10, 0.05),
+    'pressure': (980, 1030, 0.05),
+}
+SEASON_TEMPERATURES = {
+    # month -> (low base, low rise, high base, high rise, forecasts, max precipitation)
+    **dict.fromkeys([12, 1, 2], (10, 20, 25, 20, {'snow', 'cloudy', 'partly cloudy', 'clear'}, 0.8)),
+    **dict.fromkeys([3, 4, 5], (30, 25, 45, 30, {'rain', 'cloudy', 'partly cloudy', 'clear'}, 1.2)),
+    **dict.fromkeys([6, 7, 8], (55, 20, 75, 20, {'clear', 'partly cloudy', 'thunderstorm'}, 0.6)),
+    **dict.fromkeys([9, 10, 11], (35, 25, 50, 25, {'clear', 'partly cloudy', 'cloudy', 'rain'}, 0.9)),
+}
+MOON_PHASES = {'New', 'Waxing Crescent', 'First Quarter', 'Waxing Gibbous', 'Full', 'Waning Gibbous',
+               'Last Quarter', 'Waning Crescent'}
+FORECASTS = {'clear', 'partly cloudy', 'cloudy', 'rain', 'snow', 'thunderstorm'}
+
+
+def between(value, low, high, slack):
+    return low - slack <= value <= high + slack
+
+
+def clock_in(value, hours, suffix):
+    time_part, meridiem = value.split(' ')
+    hour, minute = map(int, time_part.split(':'))
+    return meridiem == suffix and hour in hours and 10 <= minute <= 59
+
+
+def simulated_in_bounds(date, day_data):
+    """Whether a simulated day has the per-day simulator's fields, each within its possible range"""
+    low_base, low_rise, high_base, high_rise, forecasts, precip_max = SEASON_TEMPERATURES[date.month]
+    low_temp = round(low_base + low_rise * (date.day / 31), 1)
+    high_temp = round(high_base + high_rise * (date.day / 31), 1)
+    return (
+        between(day_data['lowF'], low_temp * 0.8, low_temp * 1.2, 0.05)
+        and between(day_data['highF'], high_temp * 0.8, high_temp * 1.2, 0.05)
+        and between(day_data['feelsLike'], (low_temp + high_temp) / 2 * 0.8, (low_temp + high_temp) / 2 * 1.2, 0.05)
+        and day_data['precipitation'] <= precip_max + 0.005
+        and all(between(day_data[field], *bounds) for field, bounds in SIMULATED_BOUNDS.items())
+        and day_data['forecast'] in forecasts
+        and day_data['moonPhase'] in MOON_PHASES
+        and clock_in(day_data['sunrise'], {6, 7, 8}, 'AM')
+        and clock_in(day_data['sunset'], {5, 6, 7, 8}, 'PM')
+        and day_data['simulated'] is True
+    )
+
+
+def derived_in_bounds(sample, day, day_data):
+    """Whether a derived day is its sample scaled within the per-day generator's factors"""
+    day_factor = 0.9 + (day / 30) * 0.2
+    scaled = {
+        **{field: (day_factor * 0.95, day_factor * 1.05, 0.05) for field in ('lowF', 'highF', 'feelsLike')},
+        'precipitation': (0.5, 2.0, 0.005),
+        'humidity': (0.85, 1.15, 0.005),
+    }
+    for field, (low, high, slack) in scaled.items():
+        low, high = sorted((sample[field] * low, sample[field] * high))
+        if not between(day_data[field], low, min(high, 1.0) if field == 'humidity' else high, slack):
+            return False
+    unchanged = set(sample) - set(scaled) - {'forecast'}
+    return (
+        all(day_data[field] == sample[field] for field in unchanged)
+        and day_data['forecast'] in FORECASTS | {sample['forecast']}
+        and day_data['derived'] is True
+    )
+
+
+def batch_fill(months, seed):
+    """Each month's gaps in one batch per kind, seeded per month as fill_weather_gaps does"""
+    filled = []
+    for (year, month), (to_derive, samples, to_simulate) in months.items():
+        generator = np.random.default_rng([seed, year, month])
+        filled += derive_days(samples, [date.day for date in to_derive], generator)
+        filled += simulate_days(to_simulate, generator)
+    return filled
+
+
+def benchmark_fill(args):
+    # A backfill where half the months have a real sample day and half have none
+    end_date = datetime.date.today()
+    sample_rng = random.Random(7)
+    months = {}
+    date = datetime.date(end_date.year - args.fill + 1, 1, 1)
+    while date <= end_date:
+        to_derive, samples, to_simulate = months.setdefault((date.year, date.month), ([], [], []))
+        if date.month % 2:
+            sample = per_day_simulate(date.replace(day=15), sample_rng)
+            del sample['simulated']
+            to_derive.append(date)
+            samples.append(sample)
+        else:
+            to_simulate.append(date)
+        date += datetime.timedelta(days=1)
+    # In the order batch_fill returns them
+    gaps = [
+        (date, sample) for to_derive, samples, to_simulate in months.values()
+        for date, sample in list(zip(to_derive, samples)) + [(date, None) for date in to_simulate]
+    ]
+
+    rng = random.Random(args.seed)
+    start_time = time.perf_counter()
+    for _ in range(args.repeat):
+        per_day = [
+            per_day_derive(sample, date.day, rng) if sample else per_day_simulate(date, rng)
+            for date, sample in gaps
+        ]
+    per_day_time = (time.perf_counter() - start_time) / args.repeat
+
+    start_time = time.perf_counter()
+    for _ in range(args.repeat):
+        batch = batch_fill(months, args.seed)
+    batch_time = (time.perf_counter() - start_time) / args.repeat
+
+    def in_bounds(filled):
+        return all(
+            derived_in_bounds(sample, date.day, day_data) if sample else simulated_in_bounds(date, day_data)
+            for (date, sample), day_data in zip(gaps, filled)
+        )
+
+    derived = sum(1 for _, sample in gaps if sample)
+    print(f"days filled:      {len(batch)} ({derived} derived, {len(batch) - derived} simulated)")
+    print(f"per-day path:     {per_day_time * 1000:.1f}ms")
+    print(f"batch generator:  {batch_time * 1000:.1f}ms (one batch per month)")
+    print(f"same fields:      {all(list(old) == list(new) for old, new in zip(per_day, batch))}")
+    print(f"within the per-day generators' bounds: batch {in_bounds(batch)}, per-day {in_bounds(per_day)}")
+    print(f"reproducible:     {batch_fill(months, args.seed) == batch} (seed {args.seed})")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Weather backfill benchmark")
+    parser.add_argument("--days", type=int, default=365,
+                        help="Past days to backfill")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="Simulated seconds per fake OpenWeatherMap request")
+    parser.add_argument("--per-minute", type=int, default=120,
+                        help="Calls allowed per quota minute")
+    parser.add_argument("--per-day", type=int, default=300,
+                        help="Calls allowed per day")
+    parser.add_argument("--minute", type=float, default=1.0,
+                        help="Seconds in a quota minute (scaled down so the run is quick)")
+    parser.add_argument("--planner", type=int, default=None, metavar="RUNS",
+                        help="Run the planner for this many daily runs and report coverage")
+    parser.add_argument("--coverage", type=int, default=None, metavar="YEARS",
+                        help="Compare coverage-index queries with a scan over this many years of data")
+    parser.add_argument("--history", type=int, default=None, metavar="YEARS",
+                        help="Compare the columnar history store with the nested data over this many years")
+    parser.add_argument("--fill", type=int, default=None, metavar="YEARS",
+                        help="Compare the batch fill generator with the per-day one over this many years")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Seed for the fill benchmark")
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="Queries to average in the coverage benchmark")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="Backfill worker threads")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.fill:
+        benchmark_fill(args)
+    elif args.history:
+        benchmark_history(args)
+    elif args.coverage:
+        benchmark_coverage(args)
+    elif args.planner:
+        benchmark_planner(args)
+    else:
+        benchmark_backfill(args)
@@ -0,0 +1,118 @@
+import base64
+import calendar
+import datetime
+
+# Day states, ordered so that anything below REAL can still be upgraded
+MISSING, SIMULATED, DERIVED, REAL = range(4)
+STATES = {'missing': MISSING, 'simulated': SIMULATED, 'derived': DERIVED, 'real': REAL}
+MONTH_NUMBERS = {name: number for number, name in enumerate(calendar.month_name) if name}
+
+
+def year_length(year):
+    return 366 if calendar.isleap(year) else 365
+
+
+class CoverageIndex:
+    """
+    The state of every day, two bits per day: each year is a pair of bit
+    arrays (low and high bit of the state) indexed by day of year. Questions
+    such as "which days in these three years aren't real yet" become a few
+    integer mask operations per year instead of a walk over the nested data.
+    """
+
+    def __init__(self, years=None):
+        # year -> [low bits, high bits], as Python ints
+        self.years = years or {}
+
+    @classmethod
+    def from_weather_data(cls, weather_data, day_status):
+        return cls().rebuild(weather_data, day_status)
+
+    def rebuild(self, weather_data, day_status):
+        """Re-index nested {year: {month name: {day: entry}}} data from scratch"""
+        self.years = {}
+        for year, months in weather_data.items():
+            for month, days in months.items():
+                for day, day_data in days.items():
+                    self.set(datetime.date(int(year), MONTH_NUMBERS[month], int(day)), day_status(day_data))
+        return self
+
+    def entries(self):
+        """Days in any state but missing, to check the index against the data it covers"""
+        return sum((low | high).bit_count() for low, high in self.years.values())
+
+    def to_dict(self):
+        """Per year, the two bit arrays as base64 bytes (about 92 bytes a year)"""
+        return {
+            str(year): [
+                base64.b64encode(bits.to_bytes((year_length(year) + 7) // 8, 'little')).decode('ascii')
+                for bits in planes
+            ]
+            for year, planes in sorted(self.years.items())
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls({
+            int(year): [int.from_bytes(base64.b64decode(bits), 'little') for bits in planes]
+            for year, planes in data.items()
+        })
+
+    def set(self, date, status):
+        """Record a day's state; called wherever a day's entry is written"""
+        state = STATES[status]
+        planes = self.years.setdefault(date.year, [0, 0])
+        bit = 1 << (date.timetuple().tm_yday - 1)
+        for plane in range(2):
+            if state >> plane & 1:
+                planes[plane] |= bit
+            else:
+                planes[plane] &= ~bit
+
+    def status(self, date):
+        low, high = self.years.get(date.year, (0, 0))
+        day = date.timetuple().tm_yday - 1
+        state = (low >> day & 1) | (high >> day & 1) << 1
+        return next(name for name, value in STATES.items() if value == state)
+
+    def masks(self, start_date, end_date):
+        """(year, bits for the days of that year inside the range, low, high) per year"""
+        for year in range(start_date.year, end_date.year + 1):
+            first = start_date.timetuple().tm_yday - 1 if year == start_date.year else 0
+            last = end_date.timetuple().tm_yday - 1 if year == end_date.year else year_length(year) - 1
+            low, high = self.years.get(year, (0, 0))
+            yield year, ((1 << (last + 1)) - 1) & ~((1 << first) - 1), low, high
+
+    def state_masks(self, start_date, end_date, statuses):
+        states = {STATES[status] for status in statuses}
+        for year, in_range, low, high in self.masks(start_date, end_date):
+            found = 0
+            for state in states:
+                found |= (low if state & 1 else ~low) & (high if state & 2 else ~high)
+            yield year, found & in_range
+
+    def count(self, start_date, end_date):
+        """Days in the range in each state"""
+        counts = dict.fromkeys(STATES, 0)
+        for status in STATES:
+            for _, found in self.state_masks(start_date, end_date, [status]):
+                counts[status] += found.bit_count()
+        return counts
+
+    def dates(self, start_date, end_date, statuses):
+        """Dates in the range whose state is one of statuses, oldest first"""
+        found_dates = []
+        for year, found in self.state_masks(start_date, end_date, statuses):
+            first_day = datetime.date(year, 1, 1)
+            while found:
+                lowest = found & -found
+                found_dates.append(first_day + datetime.timedelta(days=lowest.bit_length() - 1))
+                found ^= lowest
+        return found_dates
+
+    def gaps(self, start_date, end_date):
+        return self.dates(start_date, end_date, ['missing'])
+
+    def days_to_upgrade(self, start_date, end_date):
+        """Days that aren't real yet: missing, simulated or derived"""
+        return self.dates(start_date, end_date, ['missing', 'simulated', 'derived'])
@@ -0,0 +1,107 @@
+import math
+
+import numpy as np
+
+# Per season (winter, spring, summer, fall), as approximated for Provo, UT:
+# lows and highs start at the base and rise by the rise over the month
+LOW_BASE = np.array([10, 30, 55, 35])
+LOW_RISE = np.array([20, 25, 20, 25])
+HIGH_BASE = np.array([25, 45, 75, 50])
+HIGH_RISE = np.array([20, 30, 20, 25])
+PRECIPITATION_MAX = np.array([0.8, 1.2, 0.6, 0.9])
+SEASON_FORECASTS = [
+    ['snow', 'cloudy', 'partly cloudy', 'clear'],
+    ['rain', 'cloudy', 'partly cloudy', 'clear'],
+    ['clear', 'partly cloudy', 'thunderstorm'],
+    ['clear', 'partly cloudy', 'cloudy', 'rain'],
+]
+# Month number - 1 -> season
+SEASON_OF_MONTH = np.array([0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0])
+MOON_PHASES = ['New', 'Waxing Crescent', 'First Quarter', 'Waxing Gibbous', 'Full', 'Waning Gibbous',
+               'Last Quarter', 'Waning Crescent']
+# What a derived day's forecast may change to
+FORECASTS = ['clear', 'partly cloudy', 'cloudy', 'rain', 'snow', 'thunderstorm']
+
+
+def simulate_days(dates, rng):
+    """
+    Simulated weather for every date in one pass: each random quantity is
+    drawn once as an array over all the days, so a month or a year costs a
+    handful of NumPy calls plus building the day dicts.
+    rng is a numpy Generator; seed it for reproducible fills.
+    """
+    size = len(dates)
+    if not size:
+        return []
+    days = np.array([date.day for date in dates])
+    seasons = SEASON_OF_MONTH[np.array([date.month for date in dates]) - 1]
+
+    low_temp = np.round(LOW_BASE[seasons] + LOW_RISE[seasons] * (days / 31), 1)
+    high_temp = np.round(HIGH_BASE[seasons] + HIGH_RISE[seasons] * (days / 31), 1)
+    rand_factor = rng.random(size) * 0.4 + 0.8  # 0.8-1.2 multiplier
+    forecast_counts = np.array([len(options) for options in SEASON_FORECASTS])[seasons]
+    forecasts = (rng.random(size) * forecast_counts).astype(int)
+
+    columns = {
+        'lowF': np.round(low_temp * rand_factor, 1),
+        'highF': np.round(high_temp * rand_factor, 1),
+        'precipitation': np.round(rng.random(size) * PRECIPITATION_MAX[seasons], 2),
+        'humidity': np.round(rng.random(size) * 0.6 + 0.2, 2),  # 20%-80%
+        'forecast': [
+            SEASON_FORECASTS[season][choice] for season, choice in zip(seasons.tolist(), forecasts.tolist())
+        ],
+        'wind': np.round(rng.random(size) * 15 + 2, 1),  # 2-17 mph
+        'airQuality': np.round(rng.random(size) * 0.8 + 0.2, 2),  # 0.2-1.0 scale
+        'uvIndex': np.round(rng.random(size) * 10, 1),  # 0-10 scale
+        'sunrise': [f"{hour}:{minute} AM" for hour, minute in zip(
+            (6 + rng.integers(0, 3, size)).tolist(), rng.integers(10, 60, size).tolist())],
+        'sunset': [f"{hour}:{minute} PM" for hour, minute in zip(
+            (5 + rng.integers(0, 4, size)).tolist(), rng.integers(10, 60, size).tolist())],
+        'moonPhase': [MOON_PHASES[phase] for phase in rng.integers(0, len(MOON_PHASES), size).tolist()],
+        'feelsLike': np.round((low_temp + high_temp) / 2 * rand_factor, 1),
+        'visibility': np.round(rng.random(size) * 8 + 2, 1),  # 2-10 miles
+        'pressure': np.round(rng.random(size) * 50 + 980, 1),  # 980-1030 hPa
+    }
+    values = [column.tolist() if isinstance(column, np.ndarray) else column for column in columns.values()]
+    return [{**dict(zip(columns, day_values)), 'simulated': True} for day_values in zip(*values)]
+
+
+def derive_days(samples, days, rng):
+    """
+    Days derived from a real sample day of the same month, all in one pass:
+    samples[i] is the sample for day of month days[i]. Temperatures follow
+    the day of the month with up to 5% noise, precipitation and humidity
+    vary around the sample's, and 30% of forecasts change. Fields the sample
+    lacks stay as they are.
+    """
+    size = len(samples)
+    if not size:
+        return []
+    day_factor = 0.9 + (np.array(days) / 30) * 0.2  # 0.9-1.1 based on day of month
+    rand_factor = rng.random(size) * 0.1 + 0.95  # 0.95-1.05 random factor
+
+    def sample_column(field):
+        # None (or no value) becomes NaN and is skipped when the day is built
+        return np.array([sample.get(field) for sample in samples], dtype=np.float64)
+
+    columns = {
+        field: np.round(sample_column(field) * day_factor * rand_factor, 1)
+        for field in ('lowF', 'highF', 'feelsLike')
+    }
+    columns['precipitation'] = np.round(sample_column('precipitation') * (rng.random(size) * 1.5 + 0.5), 2)
+    columns['humidity'] = np.minimum(1.0, np.round(sample_column('humidity') * (rng.random(size) * 0.3 + 0.85), 2))
+    forecast_changes = (rng.random(size) < 0.3).tolist()  # 30% chance
+    forecasts = rng.integers(0, len(FORECASTS), size).tolist()
+
+    values = {field: column.tolist() for field, column in columns.items()}
+    derived = []
+    for number, sample in enumerate(samples):
+        day_data = dict(sample)
+        for field, column in values.items():
+            if not math.isnan(column[number]):
+                day_data[field] = column[number]
+        if forecast_changes[number]:
+            day_data['forecast'] = FORECASTS[forecasts[number]]
+        day_data['derived'] = True
+        derived.append(day_data)
+    return derived
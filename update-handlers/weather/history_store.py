@@ -0,0 +1,163 @@
+import calendar
+import datetime
+import io
+import math
+
+import numpy as np
+
+from coverage_index import MISSING, MONTH_NUMBERS, STATES
+
+FIELDS = ('lowF', 'highF', 'precipitation', 'humidity', 'wind', 'pressure')
+STATUS_FLAGS = {STATES['simulated']: 'simulated', STATES['derived']: 'derived'}
+EPOCH = datetime.date(1970, 1, 1)
+
+
+class WeatherHistoryStore:
+    """
+    Weather history as one float32 array per field, indexed by days since
+    `start`, with NaN where a day or field has no value. A status column
+    (coverage_index states) records which days exist and how they were made.
+    Range slices and monthly/yearly rollups are array operations, and the
+    whole store saves as a compressed .npz of a few bytes per day.
+    Only FIELDS are stored; the nested JSON stays the source of the rest.
+    """
+
+    def __init__(self, start=None, columns=None, status=None):
+        self.start = start
+        self.status = status if status is not None else np.zeros(0, dtype=np.uint8)
+        self.columns = columns or {field: np.zeros(0, dtype=np.float32) for field in FIELDS}
+
+    def __len__(self):
+        return len(self.status)
+
+    @classmethod
+    def from_weather_data(cls, weather_data, day_status):
+        """Columnarize nested {year: {month name: {day: entry}}} data"""
+        dates = [
+            datetime.date(int(year), MONTH_NUMBERS[month], int(day))
+            for year, months in weather_data.items() for month, days in months.items() if days
+            for day in (min(days, key=int), max(days, key=int))
+        ]
+        store = cls()
+        if dates:
+            store.update(weather_data, min(dates), max(dates), day_status)
+        return store
+
+    def entries(self):
+        """Days in any state but missing, to check the store against the nested data"""
+        return int(np.count_nonzero(self.status))
+
+    def reserve(self, first, last):
+        """Grow the columns, padding with missing days, so they cover first..last"""
+        if self.start is None:
+            self.start = first
+        before = max(0, (self.start - first).days)
+        after = max(0, (last - self.start).days + 1 - len(self))
+        if before or after:
+            self.status = np.pad(self.status, (before, after))
+            for field, column in self.columns.items():
+                self.columns[field] = np.pad(column, (before, after), constant_values=np.nan)
+            self.start -= datetime.timedelta(days=before)
+
+    def set_day(self, date, day_data, status):
+        self.reserve(date, date)
+        offset = (date - self.start).days
+        self.status[offset] = STATES[status]
+        for field, column in self.columns.items():
+            value = day_data.get(field) if day_data else None
+            column[offset] = np.nan if value is None else value
+
+    def update(self, weather_data, start_date, end_date, day_status):
+        """Re-read start_date..end_date from the nested data, e.g. the days a run may have written"""
+        self.reserve(start_date, end_date)
+        first = (start_date - self.start).days
+        entries = []
+        date = start_date
+        while date <= end_date:
+            entries.append(weather_data.get(str(date.year), {}).get(date.strftime('%B'), {}).get(str(date.day)))
+            date += datetime.timedelta(days=1)
+        # One assignment per column rather than one per value
+        window = slice(first, first + len(entries))
+        self.status[window] = [STATES[day_status(day_data)] for day_data in entries]
+        for field, column in self.columns.items():
+            values = [day_data.get(field) if day_data else None for day_data in entries]
+            column[window] = np.array(values, dtype=np.float64)
+
+    def window(self, start_date, end_date):
+        """Views of every column for start_date..end_date (clipped to the store)"""
+        first = max(0, (start_date - self.start).days)
+        last = max(first, (end_date - self.start).days + 1)
+        return {field: column[first:last] for field, column in self.columns.items()}
+
+    def rollups(self, period='month'):
+        """
+        min/max/mean/sum of every field per month or year, ignoring missing
+        values, keyed like the nested data: {year: {month name: {field: ...}}}
+        for months, {year: {field: ...}} for years. Periods are contiguous runs
+        of days, so each statistic is one reduceat over the column.
+        """
+        if not len(self):
+            return {}
+        unit = 'datetime64[M]' if period == 'month' else 'datetime64[Y]'
+        days = np.datetime64(self.start, 'D') + np.arange(len(self))
+        labels = days.astype(unit)
+        boundaries = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+
+        stats = {}
+        for field, column in self.columns.items():
+            present = ~np.isnan(column)
+            count = np.add.reduceat(present, boundaries)
+            total = np.add.reduceat(np.where(present, column, 0).astype(np.float64), boundaries)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = total / count
+            stats[field] = {
+                name: [None if math.isnan(value) else value for value in np.round(values, 2).tolist()]
+                for name, values in (
+                    ('min', np.fmin.reduceat(column, boundaries).astype(np.float64)),
+                    ('max', np.fmax.reduceat(column, boundaries).astype(np.float64)),
+                    ('mean', mean),
+                    ('sum', np.where(count, total, np.nan)),
+                )
+            }
+        days_present = np.add.reduceat(self.status != MISSING, boundaries).tolist()
+
+        result = {}
+        for number, label in enumerate(labels[boundaries].tolist()):
+            summary = {
+                field: {name: values[number] for name, values in field_stats.items()}
+                for field, field_stats in stats.items()
+            }
+            summary['days'] = days_present[number]
+            if period == 'month':
+                result.setdefault(str(label.year), {})[calendar.month_name[label.month]] = summary
+            else:
+                result[str(label.year)] = summary
+        return result
+
+    def to_bytes(self):
+        buffer = io.BytesIO()
+        start = (self.start - EPOCH).days if self.start else 0
+        np.savez_compressed(buffer, start=np.int64(start), status=self.status, **self.columns)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        with np.load(io.BytesIO(data)) as saved:
+            status = saved['status']
+            start = EPOCH + datetime.timedelta(days=int(saved['start'])) if len(status) else None
+            return cls(start, {field: saved[field] for field in FIELDS}, status)
+
+    def to_weather_data(self):
+        """The stored fields back in the nested JSON layout, for clients of the old format"""
+        weather_data = {}
+        for offset in np.flatnonzero(self.status != MISSING):
+            date = self.start + datetime.timedelta(days=int(offset))
+            day_data = {}
+            for field, column in self.columns.items():
+                value = column[offset]
+                day_data[field] = None if np.isnan(value) else round(float(value), 2)
+            flag = STATUS_FLAGS.get(int(self.status[offset]))
+            if flag:
+                day_data[flag] = True
+            weather_data.setdefault(str(date.year), {}).setdefault(date.strftime('%B'), {})[str(date.day)] = day_data
+        return weather_data